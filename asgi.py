@@ -0,0 +1,463 @@
+"""Async (ASGI) serving mode for the dashboard.
+
+The node data routes (node data, connection stats, active sessions and the MYST
+price) are served by native async handlers on one shared httpx client, so a
+request waiting on a slow node holds a coroutine instead of a thread. Every
+other route is handed to the Flask app, which runs on a pool of worker
+threads. Run a single worker so the in-memory snapshot and discovery caches
+stay shared:
+
+    pip install -r requirements-asgi.txt
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import logging
+import re
+import time
+import uuid
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from werkzeug.http import parse_etags
+
+import dashboard
+from config import Config
+from dashboard import (
+    circuit_breaker, discovery_cache, node_snapshots, price_cache, session_store, upstream_metrics, token_manager, logger,
+    NodeUnavailableError, get_node_by_id, node_key, complete_node_data,
+    log_node_data, store_node_snapshot, endpoint_label, trace_id_var
+)
+
+async_client = None
+
+def get_async_client():
+    """The process-wide async HTTP client; created on first use inside the running event loop"""
+    global async_client
+    if async_client is None:
+        # httpx logs every request at INFO; upstream calls are already counted by upstream_metrics
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+        async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(Config.NODE_READ_TIMEOUT, connect=Config.NODE_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=Config.ASYNC_MAX_CONNECTIONS,
+                                max_keepalive_connections=Config.ASYNC_MAX_CONNECTIONS)
+        )
+    return async_client
+
+async def close_async_client():
+    global async_client
+    if async_client is not None:
+        await async_client.aclose()
+        async_client = None
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight: concurrent identical calls await one shared task"""
+
+    def __init__(self):
+        self.calls = {}
+        self.stats = {'calls': 0, 'coalesced': 0}
+
+    async def do(self, key, func):
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self.calls.pop(key, None))
+            self.stats['calls'] += 1
+        else:
+            self.stats['coalesced'] += 1
+        # Shielded so a disconnecting client does not cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def get_stats(self):
+        return dict(self.stats, in_flight=len(self.calls))
+
+async_single_flight = AsyncSingleFlight()
+
+class AsyncNodeAPI:
+    """Async client for the read-only Tequila calls behind the data routes.
+
+    Shares the circuit breaker with NodeAPI, so a node marked unreachable by
+    either serving mode is short-circuited by both, and the token manager, so a
+    401 is answered by one shared re-authentication and a retry.
+    """
+
+    def __init__(self, ip, port, token=None, node_id=None):
+        self.base_url = f"http://{ip}:{port}/tequilapi"
+        self.node_id = node_id
+        self.token = token
+        self.headers = {'Accept': 'application/json'}
+        if token:
+            self.headers['Authorization'] = f'Bearer {token}'
+        self.node_key = (str(ip), str(port))
+
+    async def send(self, method, path, **kwargs):
+        sent_token = self.token
+        response = await self.send_once(method, path, **kwargs)
+        if response.status_code == 401 and self.node_id is not None:
+            token = await asyncio.to_thread(token_manager.reauthenticate, self.node_id, sent_token)
+            if token and token != sent_token:
+                self.token = token
+                self.headers['Authorization'] = f'Bearer {token}'
+                response = await self.send_once(method, path, **kwargs)
+        return response
+
+    async def send_once(self, method, path, **kwargs):
+        circuit_breaker.before_call(self.node_key)
+        kwargs.setdefault('headers', self.headers)
+        url = f"{self.base_url}{path}"
+        if method != 'GET':
+            return await self.tracked_request(method, url, **kwargs)
+        params = kwargs.get('params') or {}
+        key = ('GET', url, tuple(sorted((str(k), str(v)) for k, v in params.items())), self.token)
+        return await async_single_flight.do(key, lambda: self.tracked_request(method, url, **kwargs))
+
+    async def tracked_request(self, method, url, **kwargs):
+        node = f"{self.node_key[0]}:{self.node_key[1]}"
+        endpoint = endpoint_label(method, url[len(self.base_url):])
+        started = time.perf_counter()
+        try:
+            response = await get_async_client().request(method, url, **kwargs)
+        except (httpx.ConnectError, httpx.TimeoutException):
+            upstream_metrics.observe('tequila', node, endpoint, time.perf_counter() - started, error=True)
+            circuit_breaker.record_failure(self.node_key)
+            raise
+        except httpx.HTTPError:
+            upstream_metrics.observe('tequila', node, endpoint, time.perf_counter() - started, error=True)
+            circuit_breaker.record_success(self.node_key)
+            raise
+        upstream_metrics.observe('tequila', node, endpoint, time.perf_counter() - started,
+                                 size=len(response.content), error=response.status_code >= 400)
+        circuit_breaker.record_success(self.node_key)
+        return response
+
+    async def get_json(self, path, error, params=None):
+        try:
+            response = await self.send('GET', path, params=params)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            raise Exception(f"{error}: {str(e)}")
+
+    async def health_check(self):
+        return await self.get_json('/healthcheck', "Health check failed")
+
+    async def session_stats(self):
+        return await self.get_json('/sessions/stats-aggregated', "Failed to get session stats")
+
+    async def session_stats_daily(self, query=None):
+        return await self.get_json('/sessions/stats-daily', "Failed to get daily session stats", params=query)
+
+    async def sessions(self, query=None):
+        return await self.get_json('/sessions', "Failed to get sessions", params=query)
+
+    async def identity_list(self):
+        return await self.get_json('/identities', "Failed to get identities")
+
+    async def service_list(self):
+        return await self.get_json('/services', "Failed to get services")
+
+    async def connection_statistics(self):
+        try:
+            return await self.get_json('/connection/statistics', "Failed to get connection statistics")
+        except Exception as e:
+            logger.warning(str(e))
+            return {"bytesReceived": 0, "bytesSent": 0, "duration": 0, "tokensSpent": 0}
+
+    async def nat_status(self):
+        try:
+            response = await self.send('GET', '/nat/type')
+            if response.status_code == 200:
+                nat_type_info = response.json()
+                if nat_type_info and 'type' in nat_type_info:
+                    nat_info = {key: nat_type_info[key] for key in ('type', 'status', 'error') if key in nat_type_info}
+                    nat_info.setdefault('status', 'finished')
+                    return nat_info
+        except (NodeUnavailableError, httpx.ConnectError, httpx.TimeoutException) as e:
+            logger.debug("Node unreachable, skipping NAT detection: %s", e)
+            return {'type': 'unknown', 'status': 'unavailable'}
+        except Exception as e:
+            logger.debug("Failed to get NAT type from nat/type endpoint: %s", e)
+
+        try:
+            proposals = await self.get_json('/proposals', "Failed to get proposals")
+            if proposals and proposals[0].get('nat_compatibility'):
+                return {'type': proposals[0]['nat_compatibility'], 'status': 'finished'}
+        except Exception as e:
+            logger.debug("Failed to get NAT info from proposals: %s", e)
+        return {'type': 'unknown', 'status': 'unavailable'}
+
+    async def node_monitoring_status(self):
+        try:
+            response = await self.send('GET', '/node/monitoring-status')
+            if response.status_code == 200:
+                return response.json()
+            logger.debug("The /node/monitoring-status endpoint returned status code %s", response.status_code)
+        except Exception as e:
+            logger.debug("Failed to get node monitoring status: %s", e)
+        return None
+
+async def sync_sessions(node_id, node_api):
+    """SessionStore.sync with the page fetches awaited and the SQLite work run in worker threads"""
+    async def run():
+        query = await asyncio.to_thread(session_store.sync_query, node_id)
+        received = 0
+        newest = None
+        page = 1
+        while True:
+            response = await node_api.sessions(dict(query, page=page))
+            items, newest, more = await asyncio.to_thread(session_store.store_page, node_id, response, page, newest)
+            received += len(items)
+            if not more:
+                break
+            page += 1
+        await asyncio.to_thread(session_store.finish_sync, node_id, newest)
+        return received
+    return await async_single_flight.do(('session_sync', node_id), run)
+
+async def fetch_node_data(node_id, node_api):
+    """Async fetch_node_data: every Tequila call for the node runs concurrently on the event loop"""
+    timings = {}
+
+    async def timed(name, coro):
+        started = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    async def synced_sessions():
+        await timed('sessions', sync_sessions(node_id, node_api))
+        return await asyncio.to_thread(session_store.recent, node_id, Config.SESSION_WINDOW_DAYS,
+                                       Config.SESSION_WINDOW_LIMIT)
+
+    async def identities_with_discovery():
+        registered = await asyncio.to_thread(get_node_by_id, node_id)
+        provider_id = (registered or {}).get('provider_id')
+        if provider_id:
+            identities = {'identities': [{'id': provider_id}]}
+        else:
+            identities = await timed('identity_list', node_api.identity_list())
+            provider_id = await asyncio.to_thread(dashboard.remember_provider_id, node_id, identities)
+        discovery = (None, None)
+        if provider_id:
+            discovery = discovery_cache.lookup(provider_id)
+        return identities, discovery
+
+    started = time.perf_counter()
+    names = ('health', 'stats', 'stats_daily', 'services', 'sessions', 'nat_info', 'monitoring_status', 'identities')
+    results = await asyncio.gather(
+        timed('health_check', node_api.health_check()),
+        timed('session_stats', node_api.session_stats()),
+        timed('session_stats_daily', node_api.session_stats_daily()),
+        timed('service_list', node_api.service_list()),
+        synced_sessions(),
+        timed('nat_status', node_api.nat_status()),
+        timed('node_monitoring_status', node_api.node_monitoring_status()),
+        identities_with_discovery()
+    )
+    data = dict(zip(names, results))
+    data['identities'], (data['quality_metrics'], data['location_info']) = data['identities']
+    timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+    return complete_node_data(data, timings)
+
+async def refresh_node_snapshot(node, kind):
+    token = await asyncio.to_thread(token_manager.token_for, node)
+    node_api = AsyncNodeAPI(node['ip'], node['port'], token, node_id=node['id'])
+    if kind == 'connection_stats':
+        value = await node_api.connection_statistics()
+    else:
+        value = await fetch_node_data(node['id'], node_api)
+        log_node_data(node['id'], value)
+    return store_node_snapshot(node, kind, value)
+
+async def get_node_snapshot(node, kind, fresh=False):
+    """Async get_node_snapshot, sharing the snapshot cache with the Flask routes and the poller"""
+    if not fresh:
+        snapshot = node_snapshots.get(node['id'], kind)
+        if snapshot:
+            if circuit_breaker.is_open(node_key(node)):
+                snapshot = dict(snapshot, offline=True)
+            return snapshot, True
+    try:
+        return await refresh_node_snapshot(node, kind), False
+    except Exception:
+        latest = node_snapshots.latest(node['id'], kind)
+        if latest and circuit_breaker.is_open(node_key(node)):
+            return dict(latest, offline=True), True
+        raise
+
+def wants_fresh(args):
+    return args.get('fresh') in ('1', 'true', 'yes')
+
+async def node_data(args, node_id):
+    node = await asyncio.to_thread(get_node_by_id, int(node_id))
+    if not node:
+        return 404, {'error': 'Node not found'}
+    try:
+        sections, compact = dashboard.parse_node_data_view(args)
+    except ValueError as e:
+        return 400, {'error': str(e)}
+    try:
+        snapshot, cached = await get_node_snapshot(node, 'data', fresh=wants_fresh(args))
+        return 200, lambda: dict(dashboard.shape_node_data(snapshot['value'], sections, compact),
+                                 **node_snapshots.markers(snapshot, cached)), \
+            dashboard.node_data_etag(snapshot, sections, compact)
+    except Exception as e:
+        logger.error(f"Error getting node data: {str(e)}")
+        return 500, {'error': str(e)}
+
+async def connection_stats(args, node_id):
+    node = await asyncio.to_thread(get_node_by_id, int(node_id))
+    if not node:
+        return 404, {'error': 'Node not found'}
+    try:
+        snapshot, cached = await get_node_snapshot(node, 'connection_stats', fresh=wants_fresh(args))
+        return 200, dict(snapshot['value'], **node_snapshots.markers(snapshot, cached))
+    except Exception as e:
+        logger.error(f"Error getting connection stats: {str(e)}")
+        return 500, {'error': str(e)}
+
+async def node_active_sessions(args, node_id):
+    node = await asyncio.to_thread(get_node_by_id, int(node_id))
+    if not node:
+        return 404, {'error': 'Node not found'}
+    try:
+        snapshot, cached = await get_node_snapshot(node, 'data', fresh=wants_fresh(args))
+        return 200, lambda: dashboard.active_sessions_payload(snapshot, cached), \
+            node_snapshots.etag(snapshot, ['sessions'], 'active')
+    except Exception as e:
+        logger.error(f"Error getting active sessions data: {str(e)}")
+        return 500, {'error': str(e)}
+
+cmc_host = urlsplit(dashboard.CMC_QUOTES_URL).netloc
+cmc_endpoint = 'GET /v2/cryptocurrency/quotes/latest'
+
+async def fetch_myst_price(api_key):
+    """Async dashboard.fetch_myst_price: the quote is fetched on the event loop and cached in a worker thread"""
+    started = time.perf_counter()
+    try:
+        response = await get_async_client().get(
+            dashboard.CMC_QUOTES_URL,
+            headers={'X-CMC_PRO_API_KEY': api_key, 'Accept': 'application/json'}
+        )
+    except httpx.HTTPError:
+        upstream_metrics.observe('coinmarketcap', cmc_host, cmc_endpoint, time.perf_counter() - started, error=True)
+        raise
+    upstream_metrics.observe('coinmarketcap', cmc_host, cmc_endpoint, time.perf_counter() - started,
+                             size=len(response.content), error=response.status_code != 200)
+    if response.status_code != 200:
+        return response.status_code, {"error": f"CoinMarketCap API error: {response.text}"}
+    processed_data = await asyncio.to_thread(dashboard.parse_myst_price, response.json())
+    if processed_data:
+        return 200, processed_data
+    return 404, {"error": "No data found for Mysterium token"}
+
+background_tasks = set()
+
+async def refresh_myst_price(api_key):
+    try:
+        status, payload = await fetch_myst_price(api_key)
+    except Exception as e:
+        status, payload = None, {'error': str(e)}
+    price_cache.count('refreshes' if status == 200 else 'errors')
+    if status != 200:
+        logger.warning(f"MYST price refresh failed: {payload.get('error')}")
+
+async def myst_price(args):
+    api_key = args.get('api_key', '')
+    if not api_key:
+        return 400, {"error": "API key is required"}
+    try:
+        quote, state = await asyncio.to_thread(price_cache.lookup)
+        if state == 'stale' and await asyncio.to_thread(price_cache.claim_refresh):
+            # Keep a reference, the event loop only holds tasks weakly
+            task = asyncio.create_task(refresh_myst_price(api_key))
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
+        if quote:
+            return 200, quote, dashboard.payload_etag(quote)
+        status, payload = await async_single_flight.do(('myst_price', api_key), lambda: fetch_myst_price(api_key))
+        if status == 200:
+            return 200, payload, dashboard.payload_etag(payload)
+        price_cache.count('errors')
+        return status, payload
+    except Exception as e:
+        return 500, {"error": str(e)}
+
+# Handlers return (status, payload) or (status, payload, etag); with an etag the payload may be
+# a callable, so a 304 answer never builds it
+ASYNC_ROUTES = [
+    (re.compile(r'^/node/(\d+)/data$'), node_data),
+    (re.compile(r'^/node/(\d+)/connection_stats$'), connection_stats),
+    (re.compile(r'^/node/(\d+)/active_sessions$'), node_active_sessions),
+    (re.compile(r'^/api/myst-price$'), myst_price),
+]
+
+async def send_json(send, status, payload, trace_id, encoding=None, etag=None, if_none_match=None):
+    """Send a JSON response; with an etag the client's If-None-Match may turn it into a bodiless 304"""
+    headers = [
+        (b'vary', b'Accept-Encoding'),
+        (b'x-request-id', trace_id.encode('latin-1'))
+    ]
+    if etag:
+        headers.append((b'cache-control', b'no-cache'))
+        if if_none_match and parse_etags(if_none_match).contains_weak(etag):
+            headers.append((b'etag', f'"{etag}"'.encode()))
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            return await send({'type': 'http.response.body', 'body': b''})
+    body = dashboard.dumps_json_bytes(payload() if callable(payload) else payload)
+    headers.append((b'content-type', b'application/json'))
+    if encoding and len(body) >= Config.COMPRESS_MIN_SIZE:
+        body = await asyncio.to_thread(dashboard.compress_body, body, encoding)
+        headers.append((b'content-encoding', encoding.encode()))
+        # The compressed body is a different byte sequence of the same content
+        etag = etag and f'W/"{etag}"'
+    elif etag:
+        etag = f'"{etag}"'
+    if etag:
+        headers.append((b'etag', etag.encode()))
+    headers.append((b'content-length', str(len(body)).encode()))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+class DashboardASGI:
+    """Routes the async data endpoints natively and everything else to the wrapped Flask app"""
+
+    def __init__(self, flask_app):
+        self.wsgi = WSGIMiddleware(flask_app, workers=Config.ASGI_WSGI_WORKERS)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, handler in ASYNC_ROUTES:
+                match = pattern.match(scope['path'])
+                if match:
+                    headers = dict(scope['headers'])
+                    trace_id = headers.get(b'x-request-id', b'').decode('latin-1') or uuid.uuid4().hex[:16]
+                    trace_id_var.set(trace_id)
+                    query = parse_qs(scope['query_string'].decode('latin-1'))
+                    args = {key: values[0] for key, values in query.items()}
+                    status, payload, *etag = await handler(args, *match.groups())
+                    encoding = dashboard.negotiate_encoding(headers.get(b'accept-encoding', b'').decode('latin-1'))
+                    return await send_json(send, status, payload, trace_id, encoding, etag[0] if etag else None,
+                                           headers.get(b'if-none-match', b'').decode('latin-1'))
+        return await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                dashboard.ensure_background_workers()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await close_async_client()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+app = DashboardASGI(dashboard.app)
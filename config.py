@@ -3,7 +3,84 @@ from datetime import timedelta
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
-    DATABASE_FILE = os.path.join(os.path.dirname(__file__), 'nodes.db')
+    DATABASE_FILE = os.environ.get('DATABASE_FILE') or os.path.join(os.path.dirname(__file__), 'nodes.db')
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{DATABASE_FILE}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
+    # Number of worker threads used to fan out Tequila API calls concurrently
+    NODE_FETCH_WORKERS = int(os.environ.get('NODE_FETCH_WORKERS') or 16)
+    # Keep-alive connection pool and default timeouts (seconds) for node HTTP calls
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE') or 20)
+    NODE_CONNECT_TIMEOUT = float(os.environ.get('NODE_CONNECT_TIMEOUT') or 3.05)
+    NODE_READ_TIMEOUT = float(os.environ.get('NODE_READ_TIMEOUT') or 15)
+    # Node API tokens: re-authenticate this long before a token expires, checking every TOKEN_CHECK_INTERVAL (seconds)
+    TOKEN_REFRESH_MARGIN = float(os.environ.get('TOKEN_REFRESH_MARGIN') or 3600)
+    TOKEN_CHECK_INTERVAL = float(os.environ.get('TOKEN_CHECK_INTERVAL') or 300)
+    # After a failed re-authentication, wait this long before trying that node again (seconds)
+    TOKEN_RETRY_COOLDOWN = float(os.environ.get('TOKEN_RETRY_COOLDOWN') or 60)
+    # Key encrypting stored node passwords: CREDENTIALS_KEY, else a key file created next to the database
+    CREDENTIALS_KEY = os.environ.get('CREDENTIALS_KEY')
+    CREDENTIALS_KEY_FILE = os.environ.get('CREDENTIALS_KEY_FILE') or os.path.join(os.path.dirname(DATABASE_FILE), 'credentials.key')
+    # Async (ASGI) mode: connections the shared async client may hold open, threads for the Flask routes
+    ASYNC_MAX_CONNECTIONS = int(os.environ.get('ASYNC_MAX_CONNECTIONS') or 500)
+    ASGI_WSGI_WORKERS = int(os.environ.get('ASGI_WSGI_WORKERS') or 32)
+    # Background poller: how often nodes are polled and how long snapshots stay fresh (seconds)
+    POLLER_ENABLED = (os.environ.get('POLLER_ENABLED') or '1') not in ('0', 'false', 'no')
+    POLL_INTERVAL = float(os.environ.get('POLL_INTERVAL') or 30)
+    POLLER_WORKERS = int(os.environ.get('POLLER_WORKERS') or 8)
+    SNAPSHOT_TTL = float(os.environ.get('SNAPSHOT_TTL') or 90)
+    # Fleet overview: global cap on concurrent node queries and deadlines (seconds)
+    FLEET_MAX_CONCURRENCY = int(os.environ.get('FLEET_MAX_CONCURRENCY') or 16)
+    FLEET_NODE_DEADLINE = float(os.environ.get('FLEET_NODE_DEADLINE') or 8)
+    FLEET_SWEEP_TIMEOUT = float(os.environ.get('FLEET_SWEEP_TIMEOUT') or 20)
+    # Bulk service actions: default and largest number of nodes acted on at once
+    FLEET_ACTION_CONCURRENCY = int(os.environ.get('FLEET_ACTION_CONCURRENCY') or 8)
+    FLEET_ACTION_MAX_CONCURRENCY = int(os.environ.get('FLEET_ACTION_MAX_CONCURRENCY') or 16)
+    # Live SSE streams: poll interval for watched nodes, keepalive period and per-viewer queue size
+    STREAM_POLL_INTERVAL = float(os.environ.get('STREAM_POLL_INTERVAL') or 5)
+    STREAM_KEEPALIVE = float(os.environ.get('STREAM_KEEPALIVE') or 15)
+    STREAM_MAX_QUEUED = int(os.environ.get('STREAM_MAX_QUEUED') or 50)
+    # Local session store: sync page size, how far back open sessions are re-checked
+    # and how many days (at most how many sessions) of sessions node data includes
+    SESSION_SYNC_PAGE_SIZE = int(os.environ.get('SESSION_SYNC_PAGE_SIZE') or 1000)
+    SESSION_OPEN_LOOKBACK_DAYS = int(os.environ.get('SESSION_OPEN_LOOKBACK_DAYS') or 14)
+    SESSION_WINDOW_DAYS = int(os.environ.get('SESSION_WINDOW_DAYS') or 30)
+    SESSION_WINDOW_LIMIT = int(os.environ.get('SESSION_WINDOW_LIMIT') or 1000)
+    # Longest ranges served by /node/<id>/timeseries, per granularity (days)
+    TIMESERIES_MAX_DAYS = int(os.environ.get('TIMESERIES_MAX_DAYS') or 365)
+    TIMESERIES_MAX_HOURLY_DAYS = int(os.environ.get('TIMESERIES_MAX_HOURLY_DAYS') or 90)
+    # Longest range served by /api/fleet/earnings (days)
+    EARNINGS_MAX_DAYS = int(os.environ.get('EARNINGS_MAX_DAYS') or 3660)
+    # Metrics history retention per tier (raw, 5-minute, hourly) and compaction period (seconds)
+    HISTORY_RAW_RETENTION_HOURS = int(os.environ.get('HISTORY_RAW_RETENTION_HOURS') or 24)
+    HISTORY_5MIN_RETENTION_DAYS = int(os.environ.get('HISTORY_5MIN_RETENTION_DAYS') or 7)
+    HISTORY_HOURLY_RETENTION_DAYS = int(os.environ.get('HISTORY_HOURLY_RETENTION_DAYS') or 180)
+    HISTORY_COMPACT_INTERVAL = int(os.environ.get('HISTORY_COMPACT_INTERVAL') or 600)
+    # Discovery API cache: base URL, batch size, LRU size and refresh/expiry periods (seconds)
+    DISCOVERY_API_URL = os.environ.get('DISCOVERY_API_URL') or 'https://discovery.mysterium.network/api/v4'
+    DISCOVERY_BATCH_SIZE = int(os.environ.get('DISCOVERY_BATCH_SIZE') or 25)
+    DISCOVERY_CACHE_SIZE = int(os.environ.get('DISCOVERY_CACHE_SIZE') or 1000)
+    DISCOVERY_CACHE_TTL = float(os.environ.get('DISCOVERY_CACHE_TTL') or 900)
+    DISCOVERY_REFRESH_INTERVAL = float(os.environ.get('DISCOVERY_REFRESH_INTERVAL') or 300)
+    DISCOVERY_TIMEOUT = float(os.environ.get('DISCOVERY_TIMEOUT') or 10)
+    # CoinMarketCap API base URL (overridable to point at a local stub)
+    CMC_API_URL = os.environ.get('CMC_API_URL') or 'https://pro-api.coinmarketcap.com'
+    # MYST price cache: served fresh for PRICE_TTL, then served stale while refreshed in the background
+    # up to PRICE_STALE_TTL (seconds); price points are kept for PRICE_HISTORY_DAYS
+    PRICE_TTL = float(os.environ.get('PRICE_TTL') or 600)
+    PRICE_STALE_TTL = float(os.environ.get('PRICE_STALE_TTL') or 3600)
+    PRICE_HISTORY_DAYS = int(os.environ.get('PRICE_HISTORY_DAYS') or 730)
+    # Logging: level, longest payload dump (characters) and how many payload dumps of each kind share one emitted dump
+    LOG_LEVEL = (os.environ.get('LOG_LEVEL') or 'INFO').upper()
+    LOG_DUMP_MAX_CHARS = int(os.environ.get('LOG_DUMP_MAX_CHARS') or 4000)
+    LOG_DUMP_SAMPLE_EVERY = int(os.environ.get('LOG_DUMP_SAMPLE_EVERY') or 10)
+    # Response compression: smallest body worth compressing (bytes) and gzip/brotli levels
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 1024)
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL') or 6)
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY') or 5)
+    # How often the help_content directory is checked for changed files (seconds)
+    HELP_CHECK_INTERVAL = float(os.environ.get('HELP_CHECK_INTERVAL') or 5)
+    # Circuit breaker for unreachable nodes: failures before opening and probe backoff bounds (seconds)
+    BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD') or 3)
+    BREAKER_BASE_BACKOFF = float(os.environ.get('BREAKER_BASE_BACKOFF') or 5)
+    BREAKER_MAX_BACKOFF = float(os.environ.get('BREAKER_MAX_BACKOFF') or 300)
@@ -2,11 +2,43 @@ import os
 import json
 from datetime import datetime, timedelta
 import requests
-from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, session
+from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, session, Response, stream_with_context, make_response, g
 import yaml
 import markdown
 import re
 import logging
+import time
+import math
+import queue
+import sqlite3
+import hashlib
+import base64
+import uuid
+import contextvars
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeoutError
+import gzip
+import numpy as np
+from requests.adapters import HTTPAdapter
+from flask.json.provider import DefaultJSONProvider
+from config import Config
+
+# Optional speedups, used when installed (see requirements-optional.txt)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+# Encrypts stored node passwords; without it expired tokens cannot be renewed automatically
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
 
 templates_dir = os.path.join(os.path.dirname(__file__), 'templates')
 static_dir = os.path.join(os.path.dirname(__file__), 'static')
@@ -26,33 +58,354 @@ app = Flask(__name__,
            template_folder=templates_dir,
            static_folder=static_dir)
 app.secret_key = 'mysterium-node-dashboard-secret-key'
+
+def dumps_json_bytes(payload):
+    """Serialize with orjson when available; falls back to json for what orjson rejects (e.g. wei amounts above 64 bits)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, default=str, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(payload, default=str).encode()
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify() through dumps_json_bytes instead of the standard library encoder"""
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_json_bytes(obj), mimetype=self.mimetype)
+
+app.json = FastJSONProvider(app)
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+
+def negotiate_encoding(accept_encoding):
+    """'br' or 'gzip' according to an Accept-Encoding header, or None"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+def compress_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=Config.COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=Config.COMPRESS_GZIP_LEVEL)
+
+@app.after_request
+def compress_response(response):
+    """Compress buffered text responses; streams (SSE, NDJSON) are left alone so events are not held back"""
+    if response.direct_passthrough or response.is_streamed or response.status_code < 200 or \
+       response.status_code in (204, 304) or 'Content-Encoding' in response.headers or \
+       response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    data = response.get_data()
+    if not encoding or len(data) < Config.COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(compress_body(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # The compressed body is a different byte sequence of the same content
+        response.set_etag(etag, weak=True)
+    return response
+
+def payload_etag(payload):
+    """Content hash of a JSON payload, for payloads without a snapshot version"""
+    return hashlib.sha1(dumps_json_bytes(payload)).hexdigest()[:20]
+
+def conditional_json(etag, build):
+    """Answer 304 if the client already holds `etag`, else jsonify(build()); clients must revalidate every time"""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+# Legacy node list, imported once into the SQLite node registry
 NODES_FILE = 'nodes.json'
 
-if not os.path.exists(NODES_FILE):
-    with open(NODES_FILE, 'w') as f:
-        json.dump([], f)
+DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    ip TEXT NOT NULL,
+    port TEXT,
+    token TEXT,
+    created_at TEXT,
+    provider_id TEXT,
+    password_encrypted TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    node_id INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    status TEXT,
+    created_at TEXT,
+    service_type TEXT,
+    consumer_country TEXT,
+    duration INTEGER DEFAULT 0,
+    bytes_sent INTEGER DEFAULT 0,
+    bytes_received INTEGER DEFAULT 0,
+    tokens REAL DEFAULT 0,
+    data TEXT NOT NULL,
+    PRIMARY KEY (node_id, id)
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_node_created ON sessions (node_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_node_status ON sessions (node_id, status, created_at);
+CREATE TABLE IF NOT EXISTS session_sync (
+    node_id INTEGER PRIMARY KEY,
+    last_created_at TEXT,
+    last_synced_at TEXT
+);
+CREATE TABLE IF NOT EXISTS session_rollups (
+    node_id INTEGER NOT NULL,
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    sessions INTEGER DEFAULT 0,
+    bytes_sent INTEGER DEFAULT 0,
+    bytes_received INTEGER DEFAULT 0,
+    tokens REAL DEFAULT 0,
+    duration INTEGER DEFAULT 0,
+    PRIMARY KEY (node_id, granularity, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS price_cache (
+    slug TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    refresh_until REAL
+);
+CREATE TABLE IF NOT EXISTS price_history (
+    slug TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (slug, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS metric_samples (
+    node_id INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    tier INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL,
+    PRIMARY KEY (node_id, metric, tier, ts)
+) WITHOUT ROWID;
+"""
 
-def get_nodes():
-    try:
-        with open(NODES_FILE, 'r') as f:
-            return json.load(f)
-    except:
-        return []
+# Columns added after their table was first released: (table, column, definition)
+DB_ADDED_COLUMNS = [
+    ('nodes', 'provider_id', 'TEXT'),
+    ('nodes', 'password_encrypted', 'TEXT'),
+]
 
-def save_nodes(nodes):
-    with open(NODES_FILE, 'w') as f:
-        json.dump(nodes, f, default=str)
+db_local = threading.local()
+db_schema_ready = False
+db_schema_lock = threading.Lock()
 
-def get_node_by_id(node_id):
-    nodes = get_nodes()
-    for node in nodes:
-        if node.get('id') == node_id:
+def add_missing_columns(conn):
+    """Bring tables created by an older version up to date with DB_SCHEMA"""
+    for table, column, definition in DB_ADDED_COLUMNS:
+        columns = [row['name'] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            conn.commit()
+
+def get_db():
+    """Per-thread connection to the dashboard's SQLite database, creating the schema on first use"""
+    global db_schema_ready
+    conn = getattr(db_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(Config.DATABASE_FILE, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        db_local.conn = conn
+    if not db_schema_ready:
+        with db_schema_lock:
+            if not db_schema_ready:
+                conn.executescript(DB_SCHEMA)
+                add_missing_columns(conn)
+                db_schema_ready = True
+    return conn
+
+class NodeRegistry:
+    """Registered nodes stored in SQLite, indexed by id and name in an in-process cache.
+
+    Every write bumps a version counter in the meta table inside the same
+    transaction, so readers in this or any other process reload only after a change.
+    """
+    
+    NODE_FIELDS = ('id', 'name', 'ip', 'port', 'token', 'created_at', 'provider_id', 'password_encrypted')
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.by_id = {}
+        self.by_name = {}
+    
+    def current_version(self, conn):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'nodes_version'").fetchone()
+        return row['value'] if row else None
+    
+    def bump_version(self, conn):
+        conn.execute(
+            """INSERT INTO meta (key, value) VALUES ('nodes_version', '1')
+               ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"""
+        )
+    
+    def write(self, func):
+        """Run func(conn) in an immediate transaction so concurrent writers are serialized"""
+        conn = get_db()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(conn)
+            self.bump_version(conn)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def import_nodes_file(self, conn):
+        """One-time import of the legacy nodes.json file"""
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'nodes_json_imported'").fetchone():
+            return
+        
+        def do_import(conn):
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'nodes_json_imported'").fetchone():
+                return 0
+            nodes = []
+            if os.path.exists(NODES_FILE):
+                with open(NODES_FILE, 'r') as f:
+                    nodes = json.load(f)
+            for node in nodes:
+                conn.execute(
+                    "INSERT OR IGNORE INTO nodes (id, name, ip, port, token, created_at, provider_id, password_encrypted) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    tuple(str(node[field]) if field == 'port' and node.get(field) is not None else node.get(field)
+                          for field in self.NODE_FIELDS)
+                )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('nodes_json_imported', ?)", (datetime.now().isoformat(),))
+            return len(nodes)
+        
+        imported = self.write(do_import)
+        if imported:
+            logger.info(f"Imported {imported} nodes from {NODES_FILE} into the node registry")
+    
+    def refresh(self):
+        conn = get_db()
+        self.import_nodes_file(conn)
+        version = self.current_version(conn)
+        with self.lock:
+            if version == self.version:
+                return
+            rows = conn.execute(f"SELECT {', '.join(self.NODE_FIELDS)} FROM nodes ORDER BY id").fetchall()
+            nodes = [dict(row) for row in rows]
+            self.by_id = {node['id']: node for node in nodes}
+            self.by_name = {node['name']: node for node in nodes}
+            self.version = version
+    
+    def all(self):
+        self.refresh()
+        return [dict(node) for node in self.by_id.values()]
+    
+    def get(self, node_id):
+        self.refresh()
+        node = self.by_id.get(node_id)
+        return dict(node) if node else None
+    
+    def name_exists(self, name):
+        self.refresh()
+        return name in self.by_name
+    
+    def add(self, name, ip, port, token, provider_id=None, password_encrypted=None):
+        def do_add(conn):
+            used_ids = [{'id': row['id']} for row in conn.execute("SELECT id FROM nodes")]
+            node = {
+                'id': get_lowest_available_id(used_ids),
+                'name': name,
+                'ip': ip,
+                'port': str(port),
+                'token': token,
+                'created_at': datetime.now().isoformat(),
+                'provider_id': provider_id,
+                'password_encrypted': password_encrypted
+            }
+            conn.execute(
+                "INSERT INTO nodes (id, name, ip, port, token, created_at, provider_id, password_encrypted) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                tuple(node[field] for field in self.NODE_FIELDS)
+            )
             return node
-    return None
+        return self.write(do_add)
+    
+    def update(self, node_id, **fields):
+        assignments = ', '.join(f"{field} = ?" for field in fields)
+        
+        def do_update(conn):
+            return conn.execute(f"UPDATE nodes SET {assignments} WHERE id = ?",
+                                (*fields.values(), node_id)).rowcount > 0
+        return self.write(do_update)
+    
+    def remove(self, node_id):
+        def do_remove(conn):
+            row = conn.execute(f"SELECT {', '.join(self.NODE_FIELDS)} FROM nodes WHERE id = ?", (node_id,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
+            return dict(row) if row else None
+        return self.write(do_remove)
+
+node_registry = NodeRegistry()
+
+def get_nodes():
+    return node_registry.all()
+
+def get_node_by_id(node_id):
+    return node_registry.get(node_id)
 
 def node_name_exists(name):
-    nodes = get_nodes()
-    return any(node.get('name') == name for node in nodes)
+    return node_registry.name_exists(name)
+
+def first_identity(identities):
+    """Id of the first identity in an identity_list response, or None"""
+    items = (identities or {}).get('identities') or []
+    return items[0]['id'] if items else None
+
+def remember_provider_id(node_id, identities):
+    """Keep the node's provider identity from an identity_list response in the registry; returns it"""
+    provider_id = first_identity(identities)
+    if provider_id and (get_node_by_id(node_id) or {}).get('provider_id') != provider_id:
+        node_registry.update(node_id, provider_id=provider_id)
+    return provider_id
+
+def provider_id_for(node_id, node_api):
+    """The node's provider identity from the registry, asked from the node on first use; None if it has none"""
+    provider_id = (get_node_by_id(node_id) or {}).get('provider_id')
+    return provider_id or remember_provider_id(node_id, node_api.identity_list())
+
+def forget_provider_id(node_id, error=None):
+    """Drop the remembered provider identity, if `error` (when given) blames the identity"""
+    if error is not None and not any(word in str(error).lower() for word in ('identity', 'provider')):
+        return
+    if (get_node_by_id(node_id) or {}).get('provider_id'):
+        logger.info(f"Forgetting provider identity of node {node_id}")
+        node_registry.update(node_id, provider_id=None)
 
 def get_lowest_available_id(nodes):
     """Find the lowest available ID that can be used for a new node"""
@@ -62,19 +415,768 @@ def get_lowest_available_id(nodes):
         id += 1
     return id
 
+class SessionStore:
+    """Local copy of every node's sessions, kept in sync incrementally from the Tequila API"""
+    
+    def __init__(self):
+        self.sync_locks = {}
+        self.lock = threading.Lock()
+    
+    def sync_lock(self, node_id):
+        with self.lock:
+            return self.sync_locks.setdefault(node_id, threading.Lock())
+    
+    def sync_start_date(self, conn, node_id):
+        """Earliest date that can hold new or changed sessions, or None for a full sync"""
+        row = conn.execute("SELECT last_created_at FROM session_sync WHERE node_id = ?", (node_id,)).fetchone()
+        if not row or not row['last_created_at']:
+            return None
+        start = row['last_created_at'][:10]
+        lookback = (datetime.utcnow() - timedelta(days=Config.SESSION_OPEN_LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+        open_row = conn.execute(
+            "SELECT MIN(created_at) AS oldest FROM sessions WHERE node_id = ? AND status = 'New' AND created_at >= ?",
+            (node_id, lookback)
+        ).fetchone()
+        if open_row['oldest']:
+            start = min(start, open_row['oldest'][:10])
+        return start
+    
+    def upsert(self, conn, node_id, items):
+        """Insert or update session rows and refresh the rollup buckets they fall into"""
+        conn.executemany(
+            """INSERT OR REPLACE INTO sessions
+               (node_id, id, status, created_at, service_type, consumer_country,
+                duration, bytes_sent, bytes_received, tokens, data)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [(
+                node_id, item.get('id'), item.get('status'), item.get('created_at'),
+                item.get('service_type'), item.get('consumer_country'),
+                int(item.get('duration') or 0), int(item.get('bytes_sent') or 0),
+                int(item.get('bytes_received') or 0), float(item.get('tokens') or 0),
+                json.dumps(item)
+            ) for item in items if item.get('id')]
+        )
+        hours = set(item['created_at'][:13] for item in items if item.get('id') and item.get('created_at'))
+        self.update_rollups(conn, node_id, hours)
+    
+    def update_rollups(self, conn, node_id, hours):
+        """Recompute the hour buckets given as 'YYYY-MM-DDTHH' and the day buckets containing them"""
+        for hour in hours:
+            conn.execute("DELETE FROM session_rollups WHERE node_id = ? AND granularity = 'hour' AND bucket = ?",
+                         (node_id, hour))
+            conn.execute(
+                """INSERT INTO session_rollups
+                   (node_id, granularity, bucket, sessions, bytes_sent, bytes_received, tokens, duration)
+                   SELECT node_id, 'hour', ?, COUNT(*), SUM(bytes_sent), SUM(bytes_received), SUM(tokens), SUM(duration)
+                   FROM sessions WHERE node_id = ? AND created_at >= ? AND created_at < ?
+                   GROUP BY node_id""",
+                (hour, node_id, hour, hour + '~')
+            )
+        for day in set(hour[:10] for hour in hours):
+            conn.execute("DELETE FROM session_rollups WHERE node_id = ? AND granularity = 'day' AND bucket = ?",
+                         (node_id, day))
+            conn.execute(
+                """INSERT INTO session_rollups
+                   (node_id, granularity, bucket, sessions, bytes_sent, bytes_received, tokens, duration)
+                   SELECT node_id, 'day', ?, SUM(sessions), SUM(bytes_sent), SUM(bytes_received), SUM(tokens), SUM(duration)
+                   FROM session_rollups WHERE node_id = ? AND granularity = 'hour' AND bucket >= ? AND bucket < ?
+                   GROUP BY node_id""",
+                (day, node_id, day, day + '~')
+            )
+    
+    def ensure_rollups(self, node_id):
+        """Build the rollups from scratch for sessions stored before rollups existed"""
+        conn = get_db()
+        if conn.execute("SELECT 1 FROM session_rollups WHERE node_id = ? LIMIT 1", (node_id,)).fetchone():
+            return
+        hours = [row[0] for row in conn.execute(
+            "SELECT DISTINCT substr(created_at, 1, 13) FROM sessions WHERE node_id = ? AND created_at IS NOT NULL",
+            (node_id,)
+        )]
+        with conn:
+            self.update_rollups(conn, node_id, hours)
+    
+    def sync(self, node_id, node_api):
+        """Pull only the sessions created since the last sync (plus still-open ones) and upsert them.
+
+        Concurrent syncs of the same node share one run. Returns the number of
+        sessions received from the node.
+        """
+        return single_flight.do(('session_sync', node_id), lambda: self.sync_now(node_id, node_api),
+                                endpoint='session_sync')
+    
+    def sync_now(self, node_id, node_api):
+        with self.sync_lock(node_id):
+            query = self.sync_query(node_id)
+            received = 0
+            newest = None
+            page = 1
+            while True:
+                response = node_api.sessions(dict(query, page=page))
+                items, newest, more = self.store_page(node_id, response, page, newest)
+                received += len(items)
+                if not more:
+                    break
+                page += 1
+            self.finish_sync(node_id, newest)
+            return received
+    
+    def sync_query(self, node_id):
+        """The /sessions query for the next incremental sync of a node"""
+        self.ensure_rollups(node_id)
+        query = {'page_size': Config.SESSION_SYNC_PAGE_SIZE}
+        date_from = self.sync_start_date(get_db(), node_id)
+        if date_from:
+            query['date_from'] = date_from
+        return query
+    
+    def store_page(self, node_id, response, page, newest):
+        """Upsert one /sessions page; returns its items, the newest created_at so far and whether more pages follow"""
+        items = (response or {}).get('items') or []
+        conn = get_db()
+        with conn:
+            self.upsert(conn, node_id, items)
+        for item in items:
+            if item.get('created_at') and (newest is None or item['created_at'] > newest):
+                newest = item['created_at']
+        paging = (response or {}).get('paging') or {}
+        return items, newest, bool(items) and page < int(paging.get('total_pages') or 1)
+    
+    def finish_sync(self, node_id, newest):
+        conn = get_db()
+        with conn:
+            conn.execute(
+                """INSERT INTO session_sync (node_id, last_created_at, last_synced_at) VALUES (?, ?, ?)
+                   ON CONFLICT(node_id) DO UPDATE SET
+                       last_created_at = MAX(COALESCE(last_created_at, ''), COALESCE(excluded.last_created_at, '')),
+                       last_synced_at = excluded.last_synced_at""",
+                (node_id, newest, datetime.utcnow().isoformat())
+            )
+    
+    def recent(self, node_id, days, limit):
+        """The newest `limit` sessions created in the last `days` days, in the Tequila /sessions shape.
+
+        Older or further sessions are served by /node/<id>/sessions.
+        """
+        conn = get_db()
+        since = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+        rows = conn.execute(
+            "SELECT data FROM sessions WHERE node_id = ? AND created_at >= ? ORDER BY created_at DESC, id DESC LIMIT ?",
+            (node_id, since, limit)
+        ).fetchall()
+        window = conn.execute("SELECT COUNT(*) FROM sessions WHERE node_id = ? AND created_at >= ?",
+                              (node_id, since)).fetchone()[0]
+        total = conn.execute("SELECT COUNT(*) FROM sessions WHERE node_id = ?", (node_id,)).fetchone()[0]
+        items = [json.loads(row['data']) for row in rows]
+        return {
+            'items': items,
+            'paging': {'total_items': total, 'window_items': window, 'window_days': days,
+                       'truncated': window > len(items)}
+        }
+    
+    def query(self, node_id, filters, limit, cursor=None):
+        """Sessions matching the filters, newest first, starting after the (created_at, id) cursor; fetches limit + 1 rows"""
+        clauses = ["node_id = ?"]
+        params = [node_id]
+        for column, key in (('status', 'status'), ('consumer_country', 'consumer_country'), ('service_type', 'service_type')):
+            if filters.get(key):
+                clauses.append(f"{column} IN ({', '.join('?' for _ in filters[key])})")
+                params.extend(filters[key])
+        if filters.get('date_from'):
+            clauses.append("created_at >= ?")
+            params.append(filters['date_from'])
+        if filters.get('date_to'):
+            clauses.append("created_at < ?")
+            params.append(filters['date_to'] + '~')
+        if cursor:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend(cursor)
+        rows = get_db().execute(
+            f"SELECT data FROM sessions WHERE {' AND '.join(clauses)} ORDER BY created_at DESC, id DESC LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+        return [json.loads(row['data']) for row in rows]
+    
+    def is_synced(self, node_id):
+        return get_db().execute("SELECT 1 FROM session_sync WHERE node_id = ?", (node_id,)).fetchone() is not None
+    
+    def synced_node_ids(self):
+        return set(row['node_id'] for row in get_db().execute("SELECT node_id FROM session_sync"))
+    
+    def timeseries(self, node_id, days, granularity):
+        """Zero-filled columnar rollups covering the last `days` days, oldest bucket first"""
+        now = datetime.utcnow()
+        if granularity == 'hour':
+            start = (now - timedelta(days=days)).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            step = timedelta(hours=1)
+            key_format = '%Y-%m-%dT%H'
+        else:
+            start = (now - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+            step = timedelta(days=1)
+            key_format = '%Y-%m-%d'
+        buckets = []
+        current = start
+        while current <= now:
+            buckets.append(current.strftime(key_format))
+            current += step
+        rows = get_db().execute(
+            """SELECT bucket, sessions, bytes_sent, bytes_received, tokens, duration FROM session_rollups
+               WHERE node_id = ? AND granularity = ? AND bucket >= ? ORDER BY bucket""",
+            (node_id, granularity, buckets[0])
+        ).fetchall()
+        by_bucket = {row['bucket']: row for row in rows}
+        series = {'sessions': [], 'bytes_sent': [], 'bytes_received': [], 'earnings': [], 'duration': []}
+        for bucket in buckets:
+            row = by_bucket.get(bucket)
+            series['sessions'].append(row['sessions'] if row else 0)
+            series['bytes_sent'].append(row['bytes_sent'] if row else 0)
+            series['bytes_received'].append(row['bytes_received'] if row else 0)
+            series['earnings'].append(round((row['tokens'] or 0) / 10**18, 6) if row else 0)
+            series['duration'].append(row['duration'] if row else 0)
+        return dict(series, granularity=granularity, days=days, buckets=buckets)
+    
+    def forget(self, node_id):
+        conn = get_db()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE node_id = ?", (node_id,))
+            conn.execute("DELETE FROM session_sync WHERE node_id = ?", (node_id,))
+            conn.execute("DELETE FROM session_rollups WHERE node_id = ?", (node_id,))
+
+session_store = SessionStore()
+
+SESSION_LIST_FILTERS = ('status', 'consumer_country', 'service_type')
+
+def parse_session_query(args):
+    """Filters, limit, cursor and projected fields for /node/<id>/sessions; raises ValueError on bad input"""
+    filters = {}
+    for key in SESSION_LIST_FILTERS:
+        values = [value.strip() for value in args.get(key, '').split(',') if value.strip()]
+        if values:
+            filters[key] = values
+    for key in ('date_from', 'date_to'):
+        if args.get(key):
+            filters[key] = datetime.strptime(args[key], '%Y-%m-%d').strftime('%Y-%m-%d')
+    if args.get('days'):
+        # Clamped so huge values cannot overflow timedelta; 100 years covers any node's history
+        days = min(max(int(args['days']), 0), 36500)
+        since = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+        filters['date_from'] = max(filters.get('date_from', since), since)
+    limit = min(max(int(args.get('limit') or 50), 1), Config.SESSION_SYNC_PAGE_SIZE)
+    cursor = decode_session_cursor(args['cursor']) if args.get('cursor') else None
+    fields = [field.strip() for field in args.get('fields', '').split(',') if field.strip()]
+    return filters, limit, cursor, fields
+
+def encode_session_cursor(session):
+    raw = json.dumps([session.get('created_at') or '', session.get('id') or '']).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_session_cursor(cursor):
+    try:
+        created_at, session_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return str(created_at), str(session_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def session_matches(session, filters, cursor):
+    """Local equivalent of SessionStore.query's WHERE clause, for sessions fetched live"""
+    for key in SESSION_LIST_FILTERS:
+        if filters.get(key) and session.get(key) not in filters[key]:
+            return False
+    created_at = session.get('created_at') or ''
+    if filters.get('date_from') and created_at < filters['date_from']:
+        return False
+    if filters.get('date_to') and created_at >= filters['date_to'] + '~':
+        return False
+    if cursor and (created_at, session.get('id') or '') >= cursor:
+        return False
+    return True
+
+def query_sessions_live(node_api, filters, limit, cursor=None):
+    """Page through the node's /sessions, letting Tequila filter by status and date and filtering the rest here"""
+    query = {'page_size': Config.SESSION_SYNC_PAGE_SIZE}
+    if len(filters.get('status', [])) == 1:
+        query['status'] = filters['status'][0]
+    if filters.get('date_from'):
+        query['date_from'] = filters['date_from']
+    date_to = filters.get('date_to')
+    if cursor:
+        date_to = min(date_to or cursor[0][:10], cursor[0][:10])
+    if date_to:
+        query['date_to'] = date_to
+    matched = []
+    page = 1
+    while True:
+        response = node_api.sessions(dict(query, page=page)) or {}
+        items = response.get('items') or []
+        matched.extend(item for item in items if session_matches(item, filters, cursor))
+        paging = response.get('paging') or {}
+        if len(matched) > limit or not items or page >= int(paging.get('total_pages') or 1):
+            break
+        page += 1
+    matched.sort(key=lambda item: (item.get('created_at') or '', item.get('id') or ''), reverse=True)
+    return matched[:limit + 1]
+
+NAT_TYPE_CODES = {'none': 0, 'fullcone': 1, 'rcone': 2, 'prcone': 3, 'symmetric': 4}
+
+class MetricsHistory:
+    """Per-node metric samples recorded at each poll, downsampled as they age.
+
+    Tier 0 holds raw samples, tier 1 five-minute buckets and tier 2 hourly
+    buckets. Each metric is aggregated with 'avg', 'max' (monotonic counters)
+    or 'last' (categorical codes such as the NAT type).
+    """
+    
+    METRICS = {
+        'reachable': 'avg',
+        'quality': 'avg',
+        'latency': 'avg',
+        'bandwidth': 'avg',
+        'uptime': 'avg',
+        'packet_loss': 'avg',
+        'monitoring_online': 'avg',
+        'nat_type': 'last',
+        'bytes_received': 'max',
+        'bytes_sent': 'max'
+    }
+    TIERS = ((0, 0), (1, 300), (2, 3600))
+    
+    def __init__(self):
+        self.last_compacted = 0
+    
+    def values_from(self, data, connection_stats):
+        values = {'reachable': 1 if data else 0}
+        if data:
+            quality = data.get('quality_metrics') or {}
+            for metric, key in (('quality', 'quality'), ('latency', 'latency'), ('bandwidth', 'bandwidth'),
+                                ('uptime', 'uptime'), ('packet_loss', 'packetLoss')):
+                if isinstance(quality.get(key), (int, float)):
+                    values[metric] = quality[key]
+            monitoring = ((data.get('monitoring_status') or {}).get('status') or 'unknown').lower()
+            if monitoring != 'unknown':
+                values['monitoring_online'] = 1 if monitoring in ('online', 'success') else 0
+            nat_type = ((data.get('nat_info') or {}).get('type') or 'unknown').lower()
+            values['nat_type'] = NAT_TYPE_CODES.get(nat_type, -1)
+        if connection_stats:
+            values['bytes_received'] = connection_stats.get('bytesReceived', 0)
+            values['bytes_sent'] = connection_stats.get('bytesSent', 0)
+        return values
+    
+    def record(self, node_id, data, connection_stats, ts=None):
+        ts = int(ts or time.time())
+        conn = get_db()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO metric_samples (node_id, metric, tier, ts, value) VALUES (?, ?, 0, ?, ?)",
+                [(node_id, metric, ts, value) for metric, value in self.values_from(data, connection_stats).items()]
+            )
+    
+    def compact(self, now=None):
+        """Fold samples older than each tier's retention into the next coarser tier and apply final retention"""
+        now = int(now or time.time())
+        retention = {
+            0: Config.HISTORY_RAW_RETENTION_HOURS * 3600,
+            1: Config.HISTORY_5MIN_RETENTION_DAYS * 86400,
+            2: Config.HISTORY_HOURLY_RETENTION_DAYS * 86400
+        }
+        conn = get_db()
+        with conn:
+            for (tier, _), (next_tier, bucket) in zip(self.TIERS, self.TIERS[1:]):
+                cutoff = (now - retention[tier]) // bucket * bucket
+                for aggregate in ('avg', 'max', 'last'):
+                    metrics = [metric for metric, how in self.METRICS.items() if how == aggregate]
+                    placeholders = ', '.join('?' for _ in metrics)
+                    value = {'avg': 'AVG(value)', 'max': 'MAX(value)', 'last': 'value'}[aggregate]
+                    # For 'last', SQLite takes the bare value column from the row holding MAX(ts)
+                    conn.execute(
+                        f"""INSERT OR REPLACE INTO metric_samples (node_id, metric, tier, ts, value)
+                            SELECT node_id, metric, ?, bucket_ts, agg_value FROM (
+                                SELECT node_id, metric, (ts / ?) * ? AS bucket_ts, {value} AS agg_value, MAX(ts)
+                                FROM metric_samples
+                                WHERE tier = ? AND ts < ? AND metric IN ({placeholders})
+                                GROUP BY node_id, metric, bucket_ts
+                            )""",
+                        (next_tier, bucket, bucket, tier, cutoff, *metrics)
+                    )
+                conn.execute("DELETE FROM metric_samples WHERE tier = ? AND ts < ?", (tier, cutoff))
+            conn.execute("DELETE FROM metric_samples WHERE tier = 2 AND ts < ?", (now - retention[2],))
+        self.last_compacted = now
+    
+    def compact_if_due(self):
+        if time.time() - self.last_compacted >= Config.HISTORY_COMPACT_INTERVAL:
+            self.compact()
+    
+    def query(self, node_id, metrics, since, until=None):
+        """Columnar series {metric: {'t': [...], 'v': [...]}} across all tiers, oldest first"""
+        until = int(until or time.time())
+        conn = get_db()
+        series = {}
+        for metric in metrics:
+            rows = conn.execute(
+                """SELECT ts, value FROM metric_samples
+                   WHERE node_id = ? AND metric = ? AND tier IN (0, 1, 2) AND ts >= ? AND ts <= ?
+                   ORDER BY ts""",
+                (node_id, metric, int(since), until)
+            ).fetchall()
+            series[metric] = {'t': [row['ts'] for row in rows], 'v': [row['value'] for row in rows]}
+        return series
+    
+    def forget(self, node_id):
+        conn = get_db()
+        with conn:
+            conn.execute("DELETE FROM metric_samples WHERE node_id = ?", (node_id,))
+
+metrics_history = MetricsHistory()
+
+TEQUILA_ID_PATH = re.compile(r'^/(services|sessions)/(?!stats-)[^/]+$')
+
+def endpoint_label(method, path):
+    """Metric label for a Tequila call, with ids in the path collapsed so labels stay bounded"""
+    return f"{method} {TEQUILA_ID_PATH.sub(lambda m: f'/{m.group(1)}/<id>', path)}"
+
+class UpstreamMetrics:
+    """Latency histograms, error counts and response sizes of outgoing HTTP calls.
+
+    Series are labelled by upstream ('tequila', 'discovery', 'coinmarketcap'),
+    node (host:port) and endpoint. Bucket counts are stored per bucket and made
+    cumulative when rendered for Prometheus.
+    """
+    
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    
+    def __init__(self):
+        self.series = {}
+        self.lock = threading.Lock()
+    
+    def observe(self, upstream, node, endpoint, seconds, size=0, error=False):
+        with self.lock:
+            series = self.series.get((upstream, node, endpoint))
+            if series is None:
+                series = {'buckets': [0] * (len(self.BUCKETS) + 1), 'count': 0, 'sum': 0.0, 'errors': 0, 'bytes': 0}
+                self.series[(upstream, node, endpoint)] = series
+            index = next((i for i, bound in enumerate(self.BUCKETS) if seconds <= bound), len(self.BUCKETS))
+            series['buckets'][index] += 1
+            series['count'] += 1
+            series['sum'] += seconds
+            series['bytes'] += size
+            if error:
+                series['errors'] += 1
+    
+    def timed(self, upstream, node, endpoint, func):
+        """Call func() and record how long it took; HTTP error statuses and exceptions count as errors"""
+        started = time.perf_counter()
+        try:
+            response = func()
+        except Exception:
+            self.observe(upstream, node, endpoint, time.perf_counter() - started, error=True)
+            raise
+        self.observe(upstream, node, endpoint, time.perf_counter() - started,
+                     size=len(response.content), error=response.status_code >= 400)
+        return response
+    
+    def quantile(self, buckets, count, q):
+        """Estimate a quantile (in seconds) from bucket counts, interpolating within the bucket"""
+        rank = q * count
+        cumulative = 0
+        lower = 0
+        for bound, n in zip(self.BUCKETS, buckets):
+            if n and cumulative + n >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / n
+            cumulative += n
+            lower = bound
+        return self.BUCKETS[-1]
+    
+    def summary(self):
+        """One row per series, slowest total time first"""
+        with self.lock:
+            items = [(key, dict(series, buckets=list(series['buckets']))) for key, series in self.series.items()]
+        rows = []
+        for (upstream, node, endpoint), series in items:
+            count = series['count']
+            rows.append({
+                'upstream': upstream,
+                'node': node,
+                'endpoint': endpoint,
+                'count': count,
+                'errors': series['errors'],
+                'error_rate': round(series['errors'] / count, 3),
+                'total_ms': round(series['sum'] * 1000, 1),
+                'avg_ms': round(series['sum'] / count * 1000, 1),
+                'p50_ms': round(self.quantile(series['buckets'], count, 0.5) * 1000, 1),
+                'p95_ms': round(self.quantile(series['buckets'], count, 0.95) * 1000, 1),
+                'p99_ms': round(self.quantile(series['buckets'], count, 0.99) * 1000, 1),
+                'avg_bytes': round(series['bytes'] / count)
+            })
+        rows.sort(key=lambda row: -row['total_ms'])
+        return rows
+    
+    def prometheus_lines(self):
+        with self.lock:
+            items = sorted((key, dict(series, buckets=list(series['buckets']))) for key, series in self.series.items())
+        lines = [
+            '# HELP dashboard_upstream_request_duration_seconds Latency of outgoing HTTP calls',
+            '# TYPE dashboard_upstream_request_duration_seconds histogram'
+        ]
+        for (upstream, node, endpoint), series in items:
+            labels = prometheus_labels(upstream=upstream, node=node, endpoint=endpoint)
+            cumulative = 0
+            for bound, n in zip(self.BUCKETS, series['buckets']):
+                cumulative += n
+                lines.append(f'dashboard_upstream_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'dashboard_upstream_request_duration_seconds_bucket{{{labels},le="+Inf"}} {series["count"]}')
+            lines.append(f'dashboard_upstream_request_duration_seconds_sum{{{labels}}} {series["sum"]:.6f}')
+            lines.append(f'dashboard_upstream_request_duration_seconds_count{{{labels}}} {series["count"]}')
+        for name, field, help_text in (
+            ('dashboard_upstream_errors_total', 'errors', 'Outgoing HTTP calls that failed or returned an error status'),
+            ('dashboard_upstream_response_bytes_total', 'bytes', 'Response body bytes received from upstreams')
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for (upstream, node, endpoint), series in items:
+                lines.append(f'{name}{{{prometheus_labels(upstream=upstream, node=node, endpoint=endpoint)}}} {series[field]}')
+        return lines
+
+def prometheus_labels(**labels):
+    escaped = {
+        key: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        for key, value in labels.items()
+    }
+    return ','.join(f'{key}="{value}"' for key, value in escaped.items())
+
+upstream_metrics = UpstreamMetrics()
+
+class SingleFlight:
+    """Collapses concurrent identical calls into one in-flight call whose result (or error) is shared"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.stats = {'calls': 0, 'coalesced': 0, 'coalesced_by_endpoint': {}}
+    
+    def do(self, key, func, endpoint=None):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self.calls[key] = call
+                self.stats['calls'] += 1
+            else:
+                self.stats['coalesced'] += 1
+                if endpoint:
+                    by_endpoint = self.stats['coalesced_by_endpoint']
+                    by_endpoint[endpoint] = by_endpoint.get(endpoint, 0) + 1
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+        try:
+            call['result'] = func()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['done'].set()
+    
+    def get_stats(self):
+        with self.lock:
+            return {
+                'calls': self.stats['calls'],
+                'coalesced': self.stats['coalesced'],
+                'in_flight': len(self.calls),
+                'coalesced_by_endpoint': dict(self.stats['coalesced_by_endpoint'])
+            }
+
+single_flight = SingleFlight()
+
+class NodeUnavailableError(Exception):
+    """Raised instead of calling a node whose circuit breaker is open"""
+
+class CircuitBreaker:
+    """Per-node health tracking for Tequila calls.
+
+    After `threshold` consecutive connection failures the breaker opens and calls
+    fail immediately with NodeUnavailableError. Once the backoff has elapsed a
+    single probe call is let through; each failed probe doubles the backoff up
+    to max_backoff, and any successful response closes the breaker.
+    """
+    
+    def __init__(self, threshold, base_backoff, max_backoff):
+        self.threshold = threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.states = {}
+        self.lock = threading.Lock()
+        self.stats = {'short_circuited': 0, 'opened': 0}
+    
+    def before_call(self, key):
+        with self.lock:
+            state = self.states.get(key)
+            if not state or state['failures'] < self.threshold:
+                return
+            now = time.time()
+            if now >= state['next_probe'] and not state['probing']:
+                state['probing'] = True
+                return
+            self.stats['short_circuited'] += 1
+            wait = max(state['next_probe'] - now, 0)
+        raise NodeUnavailableError(f"Node {key[0]}:{key[1]} is unreachable (next probe in {wait:.0f}s)")
+    
+    def record_success(self, key):
+        with self.lock:
+            self.states.pop(key, None)
+    
+    def record_failure(self, key):
+        with self.lock:
+            state = self.states.setdefault(key, {'failures': 0, 'backoff': 0, 'next_probe': 0,
+                                                 'probing': False, 'last_failure': None})
+            state['failures'] += 1
+            state['last_failure'] = time.time()
+            if state['failures'] < self.threshold:
+                return
+            if not state['backoff']:
+                state['backoff'] = self.base_backoff
+                self.stats['opened'] += 1
+            elif state['probing']:
+                state['backoff'] = min(state['backoff'] * 2, self.max_backoff)
+            else:
+                # A call that started before the breaker opened; the schedule stays as it is
+                return
+            state['probing'] = False
+            state['next_probe'] = time.time() + state['backoff']
+    
+    def is_open(self, key):
+        with self.lock:
+            state = self.states.get(key)
+            return bool(state) and state['failures'] >= self.threshold
+    
+    def get_stats(self):
+        with self.lock:
+            nodes = {
+                f"{key[0]}:{key[1]}": {
+                    'failures': state['failures'],
+                    'open': state['failures'] >= self.threshold,
+                    'next_probe_in': round(max(state['next_probe'] - time.time(), 0), 1),
+                    'last_failure': datetime.fromtimestamp(state['last_failure']).isoformat()
+                } for key, state in self.states.items()
+            }
+            return dict(self.stats, nodes=nodes)
+
+circuit_breaker = CircuitBreaker(Config.BREAKER_FAILURE_THRESHOLD, Config.BREAKER_BASE_BACKOFF, Config.BREAKER_MAX_BACKOFF)
+
+def node_key(node):
+    return (str(node['ip']), str(node['port']))
+
+http_sessions = {}
+http_sessions_lock = threading.Lock()
+http_pool_stats = {'hits': 0, 'misses': 0}
+
+def get_http_session(host, port):
+    """Return the process-wide keep-alive session for (host, port), creating it on first use"""
+    key = (str(host), str(port))
+    with http_sessions_lock:
+        http_session = http_sessions.get(key)
+        if http_session is not None:
+            http_pool_stats['hits'] += 1
+            return http_session
+        http_pool_stats['misses'] += 1
+        http_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.HTTP_POOL_MAXSIZE)
+        http_session.mount('http://', adapter)
+        http_session.mount('https://', adapter)
+        http_sessions[key] = http_session
+        return http_session
+
+def get_http_pool_stats():
+    """Session hit/miss counters plus per-host connection reuse from urllib3"""
+    with http_sessions_lock:
+        stats = dict(http_pool_stats)
+        items = list(http_sessions.items())
+    hosts = {}
+    for (host, port), http_session in items:
+        opened = 0
+        sent = 0
+        for adapter in set(http_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for pool_key in list(pools.keys()):
+                pool = pools.get(pool_key)
+                if pool is not None:
+                    opened += pool.num_connections
+                    sent += pool.num_requests
+        hosts[f"{host}:{port}"] = {
+            'connections_opened': opened,
+            'requests_sent': sent,
+            'connections_reused': max(sent - opened, 0)
+        }
+    stats['sessions'] = len(items)
+    stats['hosts'] = hosts
+    return stats
+
 class NodeAPI:
-    def __init__(self, ip, port, token=None):
+    def __init__(self, ip, port, token=None, timeout=None, node_id=None):
         self.base_url = f"http://{ip}:{port}/tequilapi"
+        self.node_id = node_id
         self.token = token
         self.headers = {'Accept': 'application/json'}
         if token:
             self.headers['Authorization'] = f'Bearer {token}'
+        self.session = get_http_session(ip, port)
+        self.node_key = (str(ip), str(port))
+        self.timeout = timeout or (Config.NODE_CONNECT_TIMEOUT, Config.NODE_READ_TIMEOUT)
+    
+    def send(self, method, path, **kwargs):
+        """Send a request to the node's Tequila API over the pooled session.
+
+        Identical concurrent GETs for the same node, endpoint and params share one
+        upstream call. Calls to a node whose circuit breaker is open fail fast
+        with NodeUnavailableError. For a registered node (node_id set) a 401 is
+        answered by one re-authentication with the stored password and a retry.
+        """
+        sent_token = self.token
+        response = self.send_once(method, path, **kwargs)
+        if response.status_code == 401 and self.node_id is not None and path != '/auth/authenticate':
+            # Concurrent calls share this object, so compare with the token this call was sent with
+            token = token_manager.reauthenticate(self.node_id, sent_token)
+            if token and token != sent_token:
+                self.token = token
+                self.headers['Authorization'] = f'Bearer {token}'
+                response = self.send_once(method, path, **kwargs)
+        return response
+    
+    def send_once(self, method, path, **kwargs):
+        circuit_breaker.before_call(self.node_key)
+        kwargs.setdefault('headers', self.headers)
+        kwargs.setdefault('timeout', self.timeout)
+        url = f"{self.base_url}{path}"
+        if method != 'GET':
+            return self.tracked_request(method, url, **kwargs)
+        params = kwargs.get('params') or {}
+        key = ('GET', url, tuple(sorted((str(k), str(v)) for k, v in params.items())), self.token)
+        return single_flight.do(key, lambda: self.tracked_request(method, url, **kwargs), endpoint=path)
+    
+    def tracked_request(self, method, url, **kwargs):
+        """Perform the request, feeding connection failures and successes to the circuit breaker"""
+        try:
+            response = upstream_metrics.timed(
+                'tequila', f"{self.node_key[0]}:{self.node_key[1]}", endpoint_label(method, url[len(self.base_url):]),
+                lambda: self.session.request(method, url, **kwargs))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            circuit_breaker.record_failure(self.node_key)
+            raise
+        except requests.exceptions.RequestException:
+            # The node answered, just not with a usable response
+            circuit_breaker.record_success(self.node_key)
+            raise
+        circuit_breaker.record_success(self.node_key)
+        return response
     
     def authenticate(self, password):
-        url = f"{self.base_url}/auth/authenticate"
         data = {'username': 'myst', 'password': password}
         try:
-            response = requests.post(url, json=data)
+            response = self.send('POST', '/auth/authenticate', json=data)
             response.raise_for_status()
             token = response.json().get('token')
             self.token = token
@@ -85,7 +1187,7 @@ class NodeAPI:
     
     def health_check(self):
         try:
-            response = requests.get(f"{self.base_url}/healthcheck", headers=self.headers)
+            response = self.send('GET', '/healthcheck')
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -93,7 +1195,7 @@ class NodeAPI:
     
     def session_stats(self):
         try:
-            response = requests.get(f"{self.base_url}/sessions/stats-aggregated", headers=self.headers)
+            response = self.send('GET', '/sessions/stats-aggregated')
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -101,7 +1203,7 @@ class NodeAPI:
     
     def session_stats_daily(self, query=None):
         try:
-            response = requests.get(f"{self.base_url}/sessions/stats-daily", headers=self.headers, params=query)
+            response = self.send('GET', '/sessions/stats-daily', params=query)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -109,7 +1211,7 @@ class NodeAPI:
     
     def sessions(self, query=None):
         try:
-            response = requests.get(f"{self.base_url}/sessions", headers=self.headers, params=query)
+            response = self.send('GET', '/sessions', params=query)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -117,7 +1219,7 @@ class NodeAPI:
     
     def identity_list(self):
         try:
-            response = requests.get(f"{self.base_url}/identities", headers=self.headers)
+            response = self.send('GET', '/identities')
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -125,7 +1227,7 @@ class NodeAPI:
     
     def service_list(self):
         try:
-            response = requests.get(f"{self.base_url}/services", headers=self.headers)
+            response = self.send('GET', '/services')
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -133,21 +1235,17 @@ class NodeAPI:
     
     def start_service(self, request):
         try:
-            print(f"Starting service with request: {request}")
-            response = requests.post(
-                f"{self.base_url}/services", 
-                json=request, 
-                headers=self.headers
-            )
+            logger.debug("Starting service with request: %s", request)
+            response = self.send('POST', '/services', json=request)
             response.raise_for_status()
             return response.json()
         except Exception as e:
-            print(f"Service start error details: {str(e)}")
+            logger.warning(f"Service start failed on {self.base_url}: {str(e)}")
             raise Exception(f"Failed to start service: {str(e)}")
 
     def stop_service(self, service_id):
         try:
-            response = requests.delete(f"{self.base_url}/services/{service_id}", headers=self.headers)
+            response = self.send('DELETE', f"/services/{service_id}")
             response.raise_for_status()
             return True
         except Exception as e:
@@ -155,20 +1253,20 @@ class NodeAPI:
     
     def connection_statistics(self):
         try:
-            response = requests.get(f"{self.base_url}/connection/statistics", headers=self.headers)
+            response = self.send('GET', '/connection/statistics')
             response.raise_for_status()
             return response.json()
         except Exception as e:
-            print(f"Failed to get connection statistics: {str(e)}")
+            logger.warning(f"Failed to get connection statistics from {self.base_url}: {str(e)}")
             return {"bytesReceived": 0, "bytesSent": 0, "duration": 0, "tokensSpent": 0}
     
     def session_by_id(self, session_id):
         try:
-            response = requests.get(f"{self.base_url}/sessions/{session_id}", headers=self.headers)
+            response = self.send('GET', f"/sessions/{session_id}")
             response.raise_for_status()
             return response.json()
         except Exception as e:
-            print(f"Failed to get session by ID: {str(e)}")
+            logger.warning(f"Failed to get session {session_id} from {self.base_url}: {str(e)}")
             return None
     
     def nat_status(self):
@@ -176,11 +1274,11 @@ class NodeAPI:
             nat_info = {}
             
             try:
-                response = requests.get(f"{self.base_url}/nat/type", headers=self.headers)
+                response = self.send('GET', '/nat/type')
                 if response.status_code == 200:
                     nat_type_info = response.json()
                     if nat_type_info:
-                        print("NAT type obtained from /nat/type endpoint")
+                        logger.debug("NAT type obtained from /nat/type endpoint")
                         
                         if 'type' in nat_type_info:
                             nat_info['type'] = nat_type_info['type']
@@ -189,9 +1287,15 @@ class NodeAPI:
                             if key in nat_type_info:
                                 nat_info[key] = nat_type_info[key]
                 else:
-                    print(f"The /nat/type endpoint returned status code {response.status_code}")
+                    logger.debug("The /nat/type endpoint returned status code %s", response.status_code)
+            except (NodeUnavailableError, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                logger.debug("Node unreachable, skipping NAT detection: %s", e)
+                return {
+                    'type': 'unknown',
+                    'status': 'unavailable'
+                }
             except Exception as e:
-                print(f"Failed to get NAT type from nat/type endpoint: {str(e)}")
+                logger.debug("Failed to get NAT type from nat/type endpoint: %s", e)
             
             if nat_info and 'type' in nat_info and 'status' not in nat_info:
                 nat_info['status'] = 'finished'
@@ -200,27 +1304,27 @@ class NodeAPI:
                 return nat_info
                 
             try:
-                response = requests.get(f"{self.base_url}/proposals", headers=self.headers)
+                response = self.send('GET', '/proposals')
                 response.raise_for_status()
                 proposals = response.json()
                 
                 if proposals and len(proposals) > 0:
                     nat_type = proposals[0].get('nat_compatibility')
                     if nat_type:
-                        print(f"NAT information extracted from proposals: {nat_type}")
+                        logger.debug("NAT information extracted from proposals: %s", nat_type)
                         return {
                             'type': nat_type,
                             'status': 'finished'
                         }
             except Exception as e:
-                print(f"Failed to get NAT info from proposals: {str(e)}")
+                logger.debug("Failed to get NAT info from proposals: %s", e)
                 
             return {
                 'type': 'unknown',
                 'status': 'unavailable'
             }
         except Exception as e:
-            print(f"All NAT detection methods failed: {str(e)}")
+            logger.warning(f"All NAT detection methods failed for {self.base_url}: {str(e)}")
             return {
                 'type': 'unknown',
                 'status': 'error'
@@ -228,25 +1332,233 @@ class NodeAPI:
 
     def node_monitoring_status(self):
         try:
-            response = requests.get(f"{self.base_url}/node/monitoring-status", headers=self.headers)
+            response = self.send('GET', '/node/monitoring-status')
             if response.status_code == 200:
                 return response.json()
             else:
-                print(f"The /node/monitoring-status endpoint returned status code {response.status_code}")
+                logger.debug("The /node/monitoring-status endpoint returned status code %s", response.status_code)
                 return None
         except Exception as e:
-            print(f"Failed to get node monitoring status: {str(e)}")
+            logger.debug("Failed to get node monitoring status: %s", e)
             return None
 
+class CredentialCipher:
+    """Fernet encryption of node passwords at rest.
+
+    The key comes from CREDENTIALS_KEY or from CREDENTIALS_KEY_FILE, which is
+    generated (mode 0600) on first use. Without the cryptography package
+    passwords are not stored at all.
+    """
+    
+    def __init__(self):
+        self.fernet = None
+        self.lock = threading.Lock()
+    
+    def available(self):
+        return Fernet is not None
+    
+    def get_fernet(self):
+        with self.lock:
+            if self.fernet is None:
+                self.fernet = Fernet(Config.CREDENTIALS_KEY or self.load_key_file())
+            return self.fernet
+    
+    def load_key_file(self):
+        path = Config.CREDENTIALS_KEY_FILE
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            if os.stat(path).st_mode & 0o077:
+                logger.warning(f"Credentials key file {path} is readable by other users, it should be mode 0600")
+            with open(path, 'rb') as f:
+                return f.read().strip()
+        key = Fernet.generate_key()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key)
+        logger.info(f"Generated credentials key file {path}")
+        return key
+    
+    def encrypt(self, password):
+        """Encrypted password, or None when encryption is unavailable"""
+        if not password or not self.available():
+            return None
+        return self.get_fernet().encrypt(password.encode()).decode()
+    
+    def decrypt(self, password_encrypted):
+        if not password_encrypted or not self.available():
+            return None
+        try:
+            return self.get_fernet().decrypt(password_encrypted.encode()).decode()
+        except InvalidToken:
+            logger.warning("A stored node password could not be decrypted with the current credentials key")
+            return None
+
+credential_cipher = CredentialCipher()
+
+def token_expiry(token):
+    """The exp claim (Unix time) of a JWT, or None when the token is not a JWT or has no expiry"""
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return float(claims['exp'])
+    except Exception:
+        return None
+
+class TokenManager:
+    """Keeps node API tokens valid by re-authenticating with the stored, encrypted passwords.
+
+    Tokens nearing expiry are renewed in the background (run); an already
+    expired token is renewed before use and a 401 triggers one renewal. Renewals
+    of one node are single-flight: concurrent callers holding the same stale
+    token wait for a single authentication and share its token. After a failed
+    authentication the node is not tried again until retry_cooldown has passed.
+    """
+    
+    def __init__(self, refresh_margin, check_interval, retry_cooldown):
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self.retry_cooldown = retry_cooldown
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.stats = {'refreshes': 0, 'failures': 0, 'skipped': 0}
+        self.warned = set()
+        self.failed_at = {}
+    
+    def node_lock(self, node_id):
+        with self.lock:
+            return self.locks.setdefault(node_id, threading.Lock())
+    
+    def reauthenticate(self, node_id, stale_token=None):
+        """A new token for the node, or None if it cannot be renewed"""
+        with self.node_lock(node_id):
+            node = get_node_by_id(node_id)
+            if not node:
+                return None
+            if stale_token is not None and node['token'] != stale_token:
+                # Renewed by another caller while we waited
+                return node['token']
+            if time.time() - self.failed_at.get(node_id, 0) < self.retry_cooldown:
+                self.stats['skipped'] += 1
+                return None
+            password = credential_cipher.decrypt(node.get('password_encrypted'))
+            if not password:
+                if node_id not in self.warned:
+                    self.warned.add(node_id)
+                    logger.warning(f"Token of node {node_id} cannot be renewed: no stored password, "
+                                   f"re-enter it with Update Password")
+                return None
+            try:
+                token = NodeAPI(node['ip'], node['port']).authenticate(password)
+            except Exception as e:
+                self.stats['failures'] += 1
+                self.failed_at[node_id] = time.time()
+                logger.warning(f"Re-authentication of node {node_id} failed, retrying in "
+                               f"{self.retry_cooldown:.0f}s at the earliest: {str(e)}")
+                return None
+            node_registry.update(node_id, token=token)
+            self.stats['refreshes'] += 1
+            self.failed_at.pop(node_id, None)
+            self.warned.discard(node_id)
+            logger.info(f"Renewed the API token of node {node_id}")
+            return token
+    
+    def token_for(self, node):
+        """The node's token, renewed first if it is already expired"""
+        expiry = token_expiry(node['token'])
+        if expiry is not None and expiry <= time.time():
+            return self.reauthenticate(node['id'], node['token']) or node['token']
+        return node['token']
+    
+    def run(self):
+        """Background loop renewing tokens that expire within refresh_margin"""
+        while True:
+            try:
+                for node in get_nodes():
+                    expiry = token_expiry(node['token'])
+                    if expiry is not None and expiry - time.time() < self.refresh_margin and node.get('password_encrypted'):
+                        self.reauthenticate(node['id'], node['token'])
+            except Exception as e:
+                logger.error(f"Token refresh sweep failed: {str(e)}")
+            time.sleep(self.check_interval)
+    
+    def reset(self, node_id):
+        """Allow an immediate retry, e.g. after the node's password was changed"""
+        with self.node_lock(node_id):
+            self.failed_at.pop(node_id, None)
+            self.warned.discard(node_id)
+    
+    def get_stats(self):
+        now = time.time()
+        return dict(self.stats, cooling_down=sum(1 for failed in self.failed_at.values() if now - failed < self.retry_cooldown))
+
+token_manager = TokenManager(Config.TOKEN_REFRESH_MARGIN, Config.TOKEN_CHECK_INTERVAL, Config.TOKEN_RETRY_COOLDOWN)
+
+def node_api_for(node):
+    """NodeAPI for a registered node: its token is renewed when expired and on a 401"""
+    return NodeAPI(node['ip'], node['port'], token_manager.token_for(node), node_id=node['id'])
+
+trace_id_var = contextvars.ContextVar('trace_id', default='-')
+
+class TraceIdFilter(logging.Filter):
+    """Stamps every record with the trace id of the request being handled ('-' outside requests)"""
+    
+    def filter(self, record):
+        record.trace_id = trace_id_var.get()
+        return True
+
+log_handler = logging.StreamHandler()
+log_handler.addFilter(TraceIdFilter())
 logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=getattr(logging, Config.LOG_LEVEL, logging.INFO),
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s',
     handlers=[
-        logging.StreamHandler()
+        log_handler
     ]
 )
 logger = logging.getLogger(__name__)
 
+class LazyJSON:
+    """Log argument that is only serialized if the record is actually emitted, truncated to max_chars"""
+    
+    def __init__(self, payload, max_chars=None):
+        self.payload = payload
+        self.max_chars = max_chars or Config.LOG_DUMP_MAX_CHARS
+    
+    def __str__(self):
+        text = json.dumps(self.payload, indent=2, default=str)
+        if len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}... ({len(text)} chars total)"
+        return text
+
+log_dump_counts = {}
+log_dump_lock = threading.Lock()
+
+def log_dump(kind, node_id, payload):
+    """Dump a payload at DEBUG, one in every LOG_DUMP_SAMPLE_EVERY per kind; costs nothing above DEBUG"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    with log_dump_lock:
+        count = log_dump_counts.get(kind, 0)
+        log_dump_counts[kind] = count + 1
+    if count % max(Config.LOG_DUMP_SAMPLE_EVERY, 1):
+        return
+    logger.debug("%s for node %s (1 in %s sampled): %s", kind, node_id, Config.LOG_DUMP_SAMPLE_EVERY, LazyJSON(payload))
+
+def submit_with_context(executor, func, *args):
+    """executor.submit that carries the caller's trace id (and other context variables) into the worker"""
+    return executor.submit(contextvars.copy_context().run, func, *args)
+
+@app.before_request
+def assign_trace_id():
+    g.trace_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+    trace_id_var.set(g.trace_id)
+
+@app.after_request
+def add_trace_id_header(response):
+    if 'trace_id' in g:
+        response.headers['X-Request-ID'] = g.trace_id
+    return response
+
 @app.route('/')
 def index():
     nodes = get_nodes()
@@ -271,18 +1583,14 @@ def add_node():
         try:
             node_api = NodeAPI(ip, port)
             token = node_api.authenticate(password)
+            try:
+                provider_id = first_identity(node_api.identity_list())
+            except Exception as e:
+                # Not fatal: it is looked up again on first use
+                logger.warning(f"Could not read the provider identity of new node {name}: {str(e)}")
+                provider_id = None
             
-            nodes = get_nodes()
-            new_node = {
-                'id': get_lowest_available_id(nodes),
-                'name': name,
-                'ip': ip,
-                'port': port,
-                'token': token,
-                'created_at': datetime.now().isoformat()
-            }
-            nodes.append(new_node)
-            save_nodes(nodes)
+            node_registry.add(name, ip, port, token, provider_id, credential_cipher.encrypt(password))
             
             flash(f'Node {name} added successfully', 'success')
             return redirect(url_for('index'))
@@ -301,6 +1609,683 @@ def node_details(node_id):
     
     return render_template('node/details.html', title=f'Node: {node["name"]}', node=node)
 
+class DiscoveryCache:
+    """Quality metrics and location per provider, fetched from the discovery API in batches.
+
+    Lookups never block: a miss or an expired entry returns what is known (or
+    nothing) and queues the provider for the background refresher, which also
+    re-fetches every cached provider on a schedule. Entries are kept in LRU order.
+    """
+    
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stats = {'hits': 0, 'misses': 0, 'batches': 0, 'errors': 0}
+    
+    def lookup(self, provider_id):
+        """Return (quality_metrics, location_info) from the cache"""
+        with self.lock:
+            entry = self.entries.get(provider_id)
+            if entry is not None:
+                self.entries.move_to_end(provider_id)
+            if entry is not None and time.time() - entry['fetched_at'] < self.ttl:
+                self.stats['hits'] += 1
+            else:
+                self.stats['misses'] += 1
+                self.pending.add(provider_id)
+                self.wakeup.set()
+        if entry is None:
+            return None, None
+        return entry['quality'], entry['location']
+    
+    def store(self, provider_id, quality, location):
+        with self.lock:
+            self.entries[provider_id] = {'quality': quality, 'location': location, 'fetched_at': time.time()}
+            self.entries.move_to_end(provider_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def fetch_batch(self, provider_ids):
+        url = f"{Config.DISCOVERY_API_URL}/proposals"
+        params = [('access_policy', 'all')] + [('provider_id', provider_id) for provider_id in provider_ids]
+        parts = urlsplit(url)
+        http_session = get_http_session(parts.hostname, parts.port or parts.scheme)
+        response = upstream_metrics.timed('discovery', parts.netloc, 'GET /proposals', lambda: http_session.get(
+            url, params=params, timeout=(Config.NODE_CONNECT_TIMEOUT, Config.DISCOVERY_TIMEOUT)))
+        response.raise_for_status()
+        found = {}
+        for proposal in response.json() or []:
+            found.setdefault(proposal.get('provider_id'), proposal)
+        for provider_id in provider_ids:
+            proposal = found.get(provider_id)
+            if proposal:
+                self.store(provider_id, proposal.get('quality', {}), proposal.get('location', {}))
+            else:
+                self.store(provider_id, None, None)
+    
+    def refresh(self, provider_ids):
+        provider_ids = sorted(provider_ids)
+        for start in range(0, len(provider_ids), Config.DISCOVERY_BATCH_SIZE):
+            batch = provider_ids[start:start + Config.DISCOVERY_BATCH_SIZE]
+            try:
+                self.fetch_batch(batch)
+                self.stats['batches'] += 1
+                logger.info(f"Refreshed discovery data for {len(batch)} providers")
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.warning(f"Error fetching discovery data: {str(e)}")
+    
+    def run(self):
+        last_full_refresh = 0
+        while True:
+            self.wakeup.wait(Config.DISCOVERY_REFRESH_INTERVAL)
+            self.wakeup.clear()
+            with self.lock:
+                provider_ids = set(self.pending)
+                self.pending.clear()
+                if time.time() - last_full_refresh >= Config.DISCOVERY_REFRESH_INTERVAL:
+                    provider_ids.update(self.entries.keys())
+                    last_full_refresh = time.time()
+            if provider_ids:
+                self.refresh(provider_ids)
+    
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, size=len(self.entries), pending=len(self.pending))
+
+discovery_cache = DiscoveryCache(Config.DISCOVERY_CACHE_SIZE, Config.DISCOVERY_CACHE_TTL)
+
+node_fetch_executor = ThreadPoolExecutor(max_workers=Config.NODE_FETCH_WORKERS, thread_name_prefix='node-fetch')
+
+def fetch_node_data(node_id, node_api):
+    """Fetch everything the node details page needs, running independent Tequila calls concurrently.
+
+    The discovery lookup depends on the provider identity, which is taken from the
+    node registry (or from identity_list on first use, chained in the same worker);
+    it is served from the discovery cache. Sessions come from the local session
+    store after an incremental sync. Per-call durations (in milliseconds) are
+    returned under 'timings'.
+    """
+    timings = {}
+
+    def timed(name, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def synced_sessions():
+        timed('sessions', session_store.sync, node_id, node_api)
+        return session_store.recent(node_id, Config.SESSION_WINDOW_DAYS, Config.SESSION_WINDOW_LIMIT)
+
+    def identities_with_discovery():
+        provider_id = (get_node_by_id(node_id) or {}).get('provider_id')
+        if provider_id:
+            identities = {'identities': [{'id': provider_id}]}
+        else:
+            identities = timed('identity_list', node_api.identity_list)
+            provider_id = remember_provider_id(node_id, identities)
+        discovery = (None, None)
+        if provider_id:
+            discovery = timed('discovery', discovery_cache.lookup, provider_id)
+        return identities, discovery
+
+    started = time.perf_counter()
+    futures = {
+        'health': submit_with_context(node_fetch_executor, timed, 'health_check', node_api.health_check),
+        'stats': submit_with_context(node_fetch_executor, timed, 'session_stats', node_api.session_stats),
+        'stats_daily': submit_with_context(node_fetch_executor, timed, 'session_stats_daily', node_api.session_stats_daily),
+        'services': submit_with_context(node_fetch_executor, timed, 'service_list', node_api.service_list),
+        'sessions': submit_with_context(node_fetch_executor, synced_sessions),
+        'nat_info': submit_with_context(node_fetch_executor, timed, 'nat_status', node_api.nat_status),
+        'monitoring_status': submit_with_context(node_fetch_executor, timed, 'node_monitoring_status', node_api.node_monitoring_status),
+        'identities': submit_with_context(node_fetch_executor, identities_with_discovery),
+    }
+    data = {name: future.result() for name, future in futures.items()}
+    data['identities'], (data['quality_metrics'], data['location_info']) = data['identities']
+    timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+    return complete_node_data(data, timings)
+
+def complete_node_data(data, timings):
+    """Fill in placeholders for the optional parts of a node data payload"""
+    if not data['nat_info']:
+        data['nat_info'] = {
+            'type': 'unknown',
+            'status': 'unavailable'
+        }
+    if not data['monitoring_status']:
+        data['monitoring_status'] = {"status": "unknown"}
+    data['timings'] = timings
+    return data
+
+def log_node_data(node_id, data):
+    sessions = data['sessions']
+    session_count = len(sessions['items']) if sessions and 'items' in sessions else 0
+    logger.info("Node %s data fetched in %s ms (%s sessions)", node_id, data['timings']['total'], session_count)
+    logger.debug("Node %s call timings: %s", node_id, data['timings'])
+    log_dump('NAT status', node_id, data['nat_info'])
+    log_dump('Monitoring status', node_id, data['monitoring_status'])
+    log_dump('Session stats', node_id, data['stats'])
+
+class NodeSnapshotCache:
+    """Latest known data per node and kind ('data', 'connection_stats'), expiring after ttl seconds"""
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.snapshots = {}
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+        # Versions restart with the process, so ETags carry an epoch to never match a previous run's
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+    
+    def get(self, node_id, kind):
+        with self.lock:
+            snapshot = self.snapshots.get((node_id, kind))
+            fresh = snapshot is not None and time.time() - snapshot['fetched_at'] < self.ttl
+            self.stats['hits' if fresh else 'misses'] += 1
+        return snapshot if fresh else None
+    
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, size=len(self.snapshots))
+    
+    def latest(self, node_id, kind):
+        """Most recent snapshot regardless of age"""
+        with self.lock:
+            return self.snapshots.get((node_id, kind))
+    
+    def put(self, node_id, kind, value):
+        previous = self.latest(node_id, kind)
+        sections = value if isinstance(value, dict) else {'': value}
+        unchanged = {
+            key for key, item in sections.items()
+            if previous and key in previous['versions'] and
+            (previous['value'] if isinstance(previous['value'], dict) else {'': previous['value']}).get(key) == item
+        }
+        with self.lock:
+            versions = {}
+            for key in sections:
+                if key in unchanged:
+                    versions[key] = previous['versions'][key]
+                else:
+                    self.version += 1
+                    versions[key] = self.version
+            snapshot = {'value': value, 'fetched_at': time.time(), 'versions': versions}
+            self.snapshots[(node_id, kind)] = snapshot
+        return snapshot
+    
+    def etag(self, snapshot, keys=None, variant=''):
+        """Validator for a view of a snapshot: changes only when one of the `keys` sections (all when None) changes.
+
+        The freshness markers are deliberately left out, so a refetch that brings
+        back identical content still answers 304.
+        """
+        versions = snapshot['versions']
+        keys = sorted(versions) if keys is None else keys
+        tag = ','.join(f"{key}:{versions.get(key, 0)}" for key in keys)
+        return hashlib.sha1(f"{self.epoch}|{variant}|{snapshot.get('offline', False)}|{tag}".encode()).hexdigest()[:20]
+    
+    def drop(self, node_id):
+        with self.lock:
+            for key in [key for key in self.snapshots if key[0] == node_id]:
+                del self.snapshots[key]
+    
+    def markers(self, snapshot, cached):
+        """Freshness fields added to payloads served from a snapshot"""
+        return {
+            'cached': cached,
+            'offline': snapshot.get('offline', False),
+            'fetched_at': datetime.fromtimestamp(snapshot['fetched_at']).isoformat(),
+            'stale_after': datetime.fromtimestamp(snapshot['fetched_at'] + self.ttl).isoformat()
+        }
+
+node_snapshots = NodeSnapshotCache(Config.SNAPSHOT_TTL)
+
+class NodeEventBus:
+    """Fan-out of node update events to the SSE streams watching each node"""
+    
+    def __init__(self, max_queued):
+        self.max_queued = max_queued
+        self.subscribers = {}
+        self.offline = set()
+        self.lock = threading.Lock()
+    
+    def subscribe(self, node_id):
+        events = queue.Queue(maxsize=self.max_queued)
+        with self.lock:
+            self.subscribers.setdefault(node_id, set()).add(events)
+        return events
+    
+    def unsubscribe(self, node_id, events):
+        with self.lock:
+            subscribers = self.subscribers.get(node_id)
+            if subscribers:
+                subscribers.discard(events)
+                if not subscribers:
+                    del self.subscribers[node_id]
+    
+    def has_subscribers(self, node_id):
+        with self.lock:
+            return bool(self.subscribers.get(node_id))
+    
+    def publish(self, node_id, event, payload, resync_payload=None):
+        """Queue an event for every subscriber; a subscriber that has fallen behind is resynced with resync_payload"""
+        with self.lock:
+            subscribers = list(self.subscribers.get(node_id, ()))
+        for events in subscribers:
+            try:
+                events.put_nowait((event, payload))
+            except queue.Full:
+                while True:
+                    try:
+                        events.get_nowait()
+                    except queue.Empty:
+                        break
+                if resync_payload is not None:
+                    events.put_nowait(('snapshot', resync_payload))
+    
+    def publish_status(self, node_id, markers):
+        """Publish a node's freshness markers as a 'status' event when it goes offline or comes back"""
+        with self.lock:
+            if markers['offline'] == (node_id in self.offline):
+                return
+            if markers['offline']:
+                self.offline.add(node_id)
+            else:
+                self.offline.discard(node_id)
+        self.publish(node_id, 'status', markers)
+
+node_events = NodeEventBus(Config.STREAM_MAX_QUEUED)
+
+DELTA_FIELDS = ('health', 'stats', 'stats_daily', 'services', 'identities', 'nat_info',
+                'monitoring_status', 'quality_metrics', 'location_info')
+
+NODE_DATA_SECTIONS = DELTA_FIELDS + ('sessions',)
+# Session fields the node page renders, and sections it does not use at all
+COMPACT_SESSION_FIELDS = ('id', 'status', 'created_at', 'duration', 'bytes_sent', 'bytes_received', 'tokens',
+                          'consumer_country', 'service_type')
+COMPACT_SKIPPED_SECTIONS = ('stats_daily', 'timings')
+
+def parse_node_data_view(args):
+    """Sections requested with ?sections=a,b (all when empty) and whether ?view=compact was asked; raises ValueError"""
+    sections = [section.strip() for section in args.get('sections', '').split(',') if section.strip()]
+    unknown = [section for section in sections if section not in NODE_DATA_SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown sections: {', '.join(unknown)}")
+    return sections, args.get('view') == 'compact'
+
+def shape_node_data(data, sections, compact):
+    """Keep only the requested sections; the compact view also drops what details.html does not render"""
+    if sections:
+        data = {section: data.get(section) for section in sections}
+    if compact:
+        data = {key: value for key, value in data.items() if key in sections or key not in COMPACT_SKIPPED_SECTIONS}
+        sessions = data.get('sessions')
+        if sessions and sessions.get('items'):
+            data['sessions'] = dict(sessions, items=[
+                {field: item.get(field) for field in COMPACT_SESSION_FIELDS} for item in sessions['items']
+            ])
+    return data
+
+def node_data_etag(snapshot, sections, compact):
+    """ETag of the node data view parse_node_data_view asked for"""
+    keys = sections or sorted(key for key in snapshot['versions'] if not (compact and key in COMPACT_SKIPPED_SECTIONS))
+    return node_snapshots.etag(snapshot, keys, 'compact' if compact else 'full')
+
+def compact_node_delta(delta):
+    """A delta restricted to what the compact view (and so the node page) contains"""
+    delta = {key: value for key, value in delta.items() if key not in COMPACT_SKIPPED_SECTIONS}
+    if delta.get('sessions'):
+        delta['sessions'] = dict(delta['sessions'], upserted=[
+            {field: item.get(field) for field in COMPACT_SESSION_FIELDS} for item in delta['sessions']['upserted']
+        ])
+    return delta
+
+def diff_node_data(old, new):
+    """Changes between two node data snapshots: upserted/removed sessions and any replaced sections"""
+    delta = {}
+    old_sessions = {item.get('id'): item for item in ((old.get('sessions') or {}).get('items') or [])}
+    new_sessions = {item.get('id'): item for item in ((new.get('sessions') or {}).get('items') or [])}
+    upserted = [item for session_id, item in new_sessions.items() if old_sessions.get(session_id) != item]
+    removed = [session_id for session_id in old_sessions if session_id not in new_sessions]
+    if upserted or removed:
+        delta['sessions'] = {'upserted': upserted, 'removed': removed}
+    for field in DELTA_FIELDS:
+        if old.get(field) != new.get(field):
+            delta[field] = new.get(field)
+    return delta
+
+def refresh_node_snapshot(node, kind):
+    node_api = node_api_for(node)
+    if kind == 'connection_stats':
+        value = node_api.connection_statistics()
+    else:
+        value = fetch_node_data(node['id'], node_api)
+        log_node_data(node['id'], value)
+    return store_node_snapshot(node, kind, value)
+
+def store_node_snapshot(node, kind, value):
+    """Cache a freshly fetched snapshot and push what changed to the node's live viewers"""
+    previous = node_snapshots.latest(node['id'], kind)
+    snapshot = node_snapshots.put(node['id'], kind, value)
+    if node_events.has_subscribers(node['id']):
+        if kind == 'data':
+            # Viewers get the compact view, the same as the stream's first snapshot
+            if not previous:
+                # Nothing for viewers to apply a delta to, so send the whole value as a snapshot
+                node_events.publish(node['id'], 'snapshot', shape_node_data(value, [], True))
+            else:
+                delta = compact_node_delta(diff_node_data(previous['value'], value))
+                if delta:
+                    node_events.publish(node['id'], 'delta', delta, resync_payload=shape_node_data(value, [], True))
+            node_events.publish_status(node['id'], node_snapshots.markers(snapshot, False))
+        elif not previous or previous['value'] != value:
+            node_events.publish(node['id'], kind, value)
+    return snapshot
+
+def get_node_snapshot(node, kind, fresh=False):
+    """Serve a node snapshot from memory, fetching it live on a miss or when fresh is requested.
+
+    When the node's circuit breaker is open the last known snapshot is served,
+    marked offline. Returns the snapshot and whether it came from the cache.
+    """
+    if not fresh:
+        snapshot = node_snapshots.get(node['id'], kind)
+        if snapshot:
+            if circuit_breaker.is_open(node_key(node)):
+                snapshot = dict(snapshot, offline=True)
+            return snapshot, True
+    try:
+        return refresh_node_snapshot(node, kind), False
+    except Exception:
+        latest = node_snapshots.latest(node['id'], kind)
+        if latest and circuit_breaker.is_open(node_key(node)):
+            return dict(latest, offline=True), True
+        raise
+
+class NodePoller(threading.Thread):
+    """Background collector that refreshes the snapshot of every registered node on a schedule.
+
+    Nodes with live SSE viewers are polled every stream_interval seconds instead,
+    so all viewers of a node share one upstream poll.
+    """
+    
+    def __init__(self, interval, stream_interval):
+        super().__init__(name='node-poller', daemon=True)
+        self.interval = interval
+        self.stream_interval = stream_interval
+        self.last_polled = {}
+        self.stopped = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=Config.POLLER_WORKERS, thread_name_prefix='node-poll')
+    
+    def poll_node(self, node):
+        trace_id_var.set(f"poll-{node['id']}")
+        values = {}
+        for kind in ('data', 'connection_stats'):
+            try:
+                values[kind] = refresh_node_snapshot(node, kind)['value']
+            except Exception as e:
+                logger.warning(f"Background poll of node {node.get('id')} ({kind}) failed: {str(e)}")
+                latest = node_snapshots.latest(node['id'], kind)
+                if kind == 'data' and latest:
+                    # Tell open pages that what they show is the last known data
+                    node_events.publish_status(node['id'], dict(node_snapshots.markers(latest, True), offline=True))
+        try:
+            metrics_history.record(node['id'], values.get('data'), values.get('connection_stats'))
+        except Exception as e:
+            logger.warning(f"Recording metrics history for node {node.get('id')} failed: {str(e)}")
+    
+    def due_nodes(self):
+        now = time.time()
+        due = []
+        for node in get_nodes():
+            interval = self.stream_interval if node_events.has_subscribers(node['id']) else self.interval
+            if now - self.last_polled.get(node['id'], 0) >= interval:
+                self.last_polled[node['id']] = now
+                due.append(node)
+        return due
+    
+    def run(self):
+        logger.info(f"Node poller started, polling every {self.interval}s ({self.stream_interval}s for streamed nodes)")
+        while not self.stopped.is_set():
+            try:
+                list(self.executor.map(self.poll_node, self.due_nodes()))
+                metrics_history.compact_if_due()
+            except Exception as e:
+                logger.error(f"Node poller cycle failed: {str(e)}")
+            self.stopped.wait(1)
+    
+    def stop(self):
+        self.stopped.set()
+
+node_poller = None
+background_started = False
+background_lock = threading.Lock()
+
+@app.before_request
+def ensure_background_workers():
+    global node_poller, background_started
+    if background_started:
+        return
+    with background_lock:
+        if background_started:
+            return
+        threading.Thread(target=discovery_cache.run, name='discovery-refresh', daemon=True).start()
+        threading.Thread(target=token_manager.run, name='token-refresh', daemon=True).start()
+        if Config.POLLER_ENABLED:
+            node_poller = NodePoller(Config.POLL_INTERVAL, Config.STREAM_POLL_INTERVAL)
+            node_poller.start()
+        background_started = True
+
+def wants_fresh():
+    return request.args.get('fresh') in ('1', 'true', 'yes')
+
+fleet_executor = ThreadPoolExecutor(max_workers=Config.FLEET_MAX_CONCURRENCY, thread_name_prefix='fleet')
+
+def summarize_fleet_node(node, health, services, stats_daily, monitoring_status, today):
+    today_stats = (stats_daily or {}).get('items', {}).get(today) or {}
+    return {
+        'id': node['id'],
+        'name': node['name'],
+        'status': 'online' if health else 'offline',
+        'health': health,
+        'services': [
+            {'id': service.get('id'), 'type': service.get('type'), 'status': service.get('status')}
+            for service in (services or [])
+        ],
+        'today': {
+            'sessions': today_stats.get('count', 0),
+            'tokens': today_stats.get('sum_tokens', 0),
+            'bytes_sent': today_stats.get('sum_bytes_sent', 0),
+            'bytes_received': today_stats.get('sum_bytes_received', 0),
+            'duration': today_stats.get('sum_duration', 0)
+        },
+        'monitoring_status': monitoring_status or {'status': 'unknown'}
+    }
+
+def fetch_fleet_node_status(node, fresh=False):
+    """Health, services, today's daily stats and monitoring status for one node.
+
+    Served from the poller snapshot when it is fresh, otherwise fetched live with
+    every call bounded by what is left of the per-node deadline.
+    """
+    started = time.perf_counter()
+    today = datetime.now().strftime('%Y-%m-%d')
+    snapshot = None if fresh else node_snapshots.get(node['id'], 'data')
+    if snapshot:
+        data = snapshot['value']
+        result = summarize_fleet_node(node, data['health'], data['services'], data['stats_daily'],
+                                      data['monitoring_status'], today)
+    else:
+        deadline = time.monotonic() + Config.FLEET_NODE_DEADLINE
+        node_api = node_api_for(node)
+
+        def call(func, *args):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise Exception(f"Deadline of {Config.FLEET_NODE_DEADLINE}s exceeded")
+            node_api.timeout = (min(Config.NODE_CONNECT_TIMEOUT, remaining), remaining)
+            return func(*args)
+
+        health = call(node_api.health_check)
+        services = call(node_api.service_list)
+        stats_daily = call(node_api.session_stats_daily, {'date_from': today, 'date_to': today})
+        monitoring_status = call(node_api.node_monitoring_status)
+        result = summarize_fleet_node(node, health, services, stats_daily, monitoring_status, today)
+    result['cached'] = snapshot is not None
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+def sweep_fleet(nodes, fresh=False):
+    """Query every node in parallel, yielding each node's status as soon as it is known.
+
+    Concurrency is capped by the shared fleet executor; nodes that have not answered
+    by the end of the sweep are yielded with a 'timeout' status.
+    """
+    futures = {submit_with_context(fleet_executor, fetch_fleet_node_status, node, fresh): node for node in nodes}
+    try:
+        for future in as_completed(futures, timeout=Config.FLEET_SWEEP_TIMEOUT):
+            node = futures[future]
+            try:
+                yield future.result()
+            except Exception as e:
+                status = 'offline' if circuit_breaker.is_open(node_key(node)) else 'error'
+                yield {'id': node['id'], 'name': node['name'], 'status': status, 'error': str(e)}
+    except FuturesTimeoutError:
+        for future, node in futures.items():
+            if not future.done():
+                future.cancel()
+                yield {'id': node['id'], 'name': node['name'], 'status': 'timeout',
+                       'error': f"No response within {Config.FLEET_SWEEP_TIMEOUT}s"}
+
+@app.route('/api/fleet')
+def fleet_status():
+    nodes = get_nodes()
+    fresh = wants_fresh()
+    
+    if request.args.get('stream') in ('1', 'true', 'yes'):
+        def generate():
+            for result in sweep_fleet(nodes, fresh):
+                yield json.dumps(result, default=str) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    started = time.perf_counter()
+    results = sorted(sweep_fleet(nodes, fresh), key=lambda result: result['id'])
+    summary = {'total': len(results)}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return jsonify({
+        'nodes': results,
+        'summary': summary,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    })
+
+FLEET_SERVICE_ACTIONS = ('start', 'stop')
+
+def apply_service_action(node, action, service_type):
+    """Start or stop `service_type` on one node; nodes already in the wanted state are left 'unchanged'"""
+    started = time.perf_counter()
+    node_api = node_api_for(node)
+    matching = [service for service in (node_api.service_list() or []) if service.get('type') == service_type]
+    if action == 'start':
+        running = [service for service in matching if service.get('status') != 'NotRunning']
+        if running:
+            status, service_ids = 'unchanged', [service.get('id') for service in running]
+        else:
+            provider_id = provider_id_for(node['id'], node_api)
+            if not provider_id:
+                raise Exception("No identities found on node")
+            try:
+                service = node_api.start_service({'provider_id': provider_id, 'type': service_type})
+            except Exception as e:
+                forget_provider_id(node['id'], e)
+                raise
+            status, service_ids = 'started', [service.get('id')]
+    else:
+        for service in matching:
+            node_api.stop_service(service.get('id'))
+        status, service_ids = ('stopped' if matching else 'unchanged'), [service.get('id') for service in matching]
+    return {
+        'id': node['id'],
+        'name': node['name'],
+        'status': status,
+        'services': service_ids,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+def run_service_action(nodes, action, service_type, concurrency):
+    """Apply a service action across nodes, at most `concurrency` at a time, yielding each result as it completes"""
+    pending = iter(nodes)
+    futures = {}
+    
+    def submit_next():
+        node = next(pending, None)
+        if node:
+            futures[submit_with_context(fleet_executor, apply_service_action, node, action, service_type)] = node
+    
+    for _ in range(concurrency):
+        submit_next()
+    while futures:
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            node = futures.pop(future)
+            try:
+                yield future.result()
+            except Exception as e:
+                logger.warning(f"Service {action} of {service_type} failed on node {node['id']}: {str(e)}")
+                yield {'id': node['id'], 'name': node['name'], 'status': 'error', 'error': str(e)}
+            submit_next()
+
+@app.route('/api/fleet/services', methods=['POST'])
+def fleet_services():
+    """Start or stop one service type on many nodes in parallel.
+
+    JSON body: action ('start' or 'stop'), service_type, node_ids (all nodes when
+    omitted) and optionally concurrency. Results are streamed as NDJSON, one line
+    per node as it completes, followed by a summary line.
+    """
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    service_type = data.get('service_type')
+    if action not in FLEET_SERVICE_ACTIONS:
+        return jsonify({'error': f"action must be one of: {', '.join(FLEET_SERVICE_ACTIONS)}"}), 400
+    if not service_type:
+        return jsonify({'error': 'service_type is required'}), 400
+    try:
+        concurrency = int(data.get('concurrency') or Config.FLEET_ACTION_CONCURRENCY)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency must be an integer'}), 400
+    concurrency = max(1, min(concurrency, Config.FLEET_ACTION_MAX_CONCURRENCY))
+    
+    nodes = get_nodes()
+    if data.get('node_ids') is not None:
+        try:
+            node_ids = set(int(node_id) for node_id in data['node_ids'])
+        except (TypeError, ValueError):
+            return jsonify({'error': 'node_ids must be a list of node ids'}), 400
+        unknown = node_ids - set(node['id'] for node in nodes)
+        if unknown:
+            return jsonify({'error': f"Unknown node ids: {', '.join(str(node_id) for node_id in sorted(unknown))}"}), 400
+        nodes = [node for node in nodes if node['id'] in node_ids]
+    
+    logger.info(f"Fleet service action: {action} {service_type} on {len(nodes)} nodes, {concurrency} at a time")
+    
+    def generate():
+        started = time.perf_counter()
+        summary = {'total': len(nodes)}
+        for result in run_service_action(nodes, action, service_type, concurrency):
+            summary[result['status']] = summary.get(result['status'], 0) + 1
+            yield json.dumps(result, default=str) + '\n'
+        yield json.dumps({'summary': summary, 'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/node/<int:node_id>/data')
 def node_data(node_id):
     node = get_node_by_id(node_id)
@@ -308,154 +2293,161 @@ def node_data(node_id):
         return jsonify({'error': 'Node not found'}), 404
     
     try:
-        node_api = NodeAPI(node['ip'], node['port'], node['token'])
-        
-        health = node_api.health_check()
-        stats = node_api.session_stats()
-        stats_daily = node_api.session_stats_daily()
-        services = node_api.service_list()
-        identities = node_api.identity_list()
-        
-        sessions = node_api.sessions({"page_size": 1000})
-        
-        nat_info = node_api.nat_status()
-        logger.info("\n=== NAT Status Info ===")
-        if nat_info:
-            logger.info(f"Raw NAT status: {json.dumps(nat_info, indent=2)}")
-        else:
-            logger.info("NAT status unavailable, creating placeholder")
-            nat_info = {
-                'type': 'unknown',
-                'status': 'unavailable'
-            }
-        logger.info("=====================\n")
-        
-        monitoring_status = node_api.node_monitoring_status()
-        logger.info("\n=== Node Monitoring Status ===")
-        if monitoring_status:
-            logger.info(f"Monitoring status: {json.dumps(monitoring_status, indent=2)}")
-        else:
-            logger.info("Node monitoring status unavailable")
-            monitoring_status = {"status": "unknown"}
-        logger.info("==========================\n")
-        
-        quality_metrics = None
-        location_info = None
-        if identities and 'identities' in identities and len(identities['identities']) > 0:
-            provider_id = identities['identities'][0]['id']
+        try:
+            sections, compact = parse_node_data_view(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        snapshot, cached = get_node_snapshot(node, 'data', fresh=wants_fresh())
+        return conditional_json(node_data_etag(snapshot, sections, compact), lambda: dict(
+            shape_node_data(snapshot['value'], sections, compact), **node_snapshots.markers(snapshot, cached)))
+    except Exception as e:
+        logger.error(f"Error getting node data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {dumps_json_bytes(payload).decode()}\n\n"
+
+@app.route('/node/<int:node_id>/stream')
+def node_stream(node_id):
+    node = get_node_by_id(node_id)
+    if not node:
+        return jsonify({'error': 'Node not found'}), 404
+    
+    def generate():
+        events = node_events.subscribe(node_id)
+        try:
             try:
-                import requests
-                logger.info(f"Fetching quality metrics from discovery API for provider {provider_id}")
-                discovery_url = f"https://discovery.mysterium.network/api/v4/proposals?access_policy=all&provider_id={provider_id}"
-                discovery_response = requests.get(discovery_url, timeout=5)
-                if discovery_response.status_code == 200:
-                    discovery_data = discovery_response.json()
-                    if discovery_data and len(discovery_data) > 0:
-                        quality_metrics = discovery_data[0].get('quality', {})
-                        location_info = discovery_data[0].get('location', {})
-                        logger.info(f"Found quality metrics for provider {provider_id}: {quality_metrics}")
-                        logger.info(f"Found location info for provider {provider_id}: {location_info}")
+                snapshot, cached = get_node_snapshot(node, 'data')
+                yield sse_event('snapshot', dict(shape_node_data(snapshot['value'], [], True),
+                                                 **node_snapshots.markers(snapshot, cached)))
             except Exception as e:
-                logger.warning(f"Error fetching discovery data: {str(e)}")
-        
-        logger.info("\n=== Session Stats Data ===")
-        logger.info(f"Raw stats response: {json.dumps(stats, indent=2)}")
-        if 'stats' in stats:
-            logger.info(f"Stats object keys: {list(stats['stats'].keys())}")
-            for key, value in stats['stats'].items():
-                logger.info(f"  {key}: {value}")
-        else:
-            logger.info("No 'stats' key in stats response")
-        logger.info("===========================\n")
-        
-        if sessions and 'items' in sessions:
-            logger.info(f"\nSession count for node {node_id}: {len(sessions['items'])}")
+                logger.error(f"Error getting initial stream snapshot for node {node_id}: {str(e)}")
+                yield sse_event('error', {'error': str(e)})
+            while True:
+                try:
+                    event, payload = events.get(timeout=Config.STREAM_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_event(event, payload)
+        finally:
+            node_events.unsubscribe(node_id, events)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/node/<int:node_id>/timeseries')
+def node_timeseries(node_id):
+    node = get_node_by_id(node_id)
+    if not node:
+        return jsonify({'error': 'Node not found'}), 404
+    
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ('hour', 'day'):
+        return jsonify({'error': "granularity must be 'hour' or 'day'"}), 400
+    try:
+        days = int(request.args.get('days', 7))
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
+    max_days = Config.TIMESERIES_MAX_HOURLY_DAYS if granularity == 'hour' else Config.TIMESERIES_MAX_DAYS
+    days = max(1, min(days, max_days))
+    
+    try:
+        if session_store.is_synced(node_id):
+            session_store.ensure_rollups(node_id)
         else:
-            logger.info(f"\nNo sessions data available for node {node_id}")
-        
-        return jsonify({
-            'health': health,
-            'stats': stats,
-            'stats_daily': stats_daily,
-            'services': services,
-            'identities': identities,
-            'sessions': sessions,
-            'quality_metrics': quality_metrics,
-            'location_info': location_info,
-            'nat_info': nat_info,
-            'monitoring_status': monitoring_status
-        })
+            session_store.sync(node_id, node_api_for(node))
+        return jsonify(session_store.timeseries(node_id, days, granularity))
     except Exception as e:
-        logger.error(f"Error getting node data: {str(e)}")
+        logger.error(f"Error getting timeseries for node {node_id}: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/node/<int:node_id>/history')
+def node_history(node_id):
+    node = get_node_by_id(node_id)
+    if not node:
+        return jsonify({'error': 'Node not found'}), 404
+    
+    metrics = [metric for metric in request.args.get('metrics', 'quality').split(',') if metric]
+    unknown = [metric for metric in metrics if metric not in MetricsHistory.METRICS]
+    if unknown:
+        return jsonify({'error': f"Unknown metrics: {', '.join(unknown)}",
+                        'available': list(MetricsHistory.METRICS)}), 400
+    try:
+        hours = float(request.args.get('hours', 24))
+    except ValueError:
+        return jsonify({'error': 'hours must be a number'}), 400
+    if not math.isfinite(hours):
+        return jsonify({'error': 'hours must be a finite number'}), 400
+    # Nothing is kept beyond the hourly tier's retention
+    hours = max(0, min(hours, Config.HISTORY_HOURLY_RETENTION_DAYS * 24))
+    
+    since = time.time() - hours * 3600
+    return jsonify({
+        'node_id': node_id,
+        'since': int(since),
+        'series': metrics_history.query(node_id, metrics, since)
+    })
+
 @app.route('/node/<int:node_id>/start_service', methods=['POST'])
 def start_service(node_id):
     node = get_node_by_id(node_id)
     if not node:
         return jsonify({"error": "Node not found"}), 404
     
-    logger.info(f"\n=== Service Start Request for Node {node_id} ===")
-    logger.info(f"Request Content-Type: {request.headers.get('Content-Type')}")
-    logger.info(f"Request method: {request.method}")
+    logger.debug("Service start request for node %s", node_id)
+    logger.debug("Request Content-Type: %s", request.headers.get('Content-Type'))
+    logger.debug("Request method: %s", request.method)
     
     try:
         if request.is_json:
             data = request.json
-            logger.info(f"Received JSON data: {data}")
+            logger.debug("Received JSON data: %s", data)
         else:
             data = request.form.to_dict()
-            logger.info(f"Received form data: {data}")
+            logger.debug("Received form data: %s", data)
         
         service_type = data.get('type')
         provider_id = data.get('provider_id')
         
-        logger.info(f"Extracted: service_type={service_type}, provider_id={provider_id}")
+        logger.debug("Extracted: service_type=%s, provider_id=%s", service_type, provider_id)
         
         if not service_type:
             return jsonify({"error": "Service type is required"}), 400
         
         if not provider_id:
-            logger.info("No provider_id in request, getting from identities API")
-            node_api = NodeAPI(node['ip'], node['port'], node['token'])
-            identities = node_api.identity_list()
+            logger.debug("No provider_id in request, using the node's provider identity")
+            provider_id = provider_id_for(node_id, node_api_for(node))
             
-            if not identities or 'identities' not in identities or not identities['identities']:
+            if not provider_id:
                 return jsonify({"error": "No identities found on node"}), 400
             
-            provider_id = identities['identities'][0]['id']
-            logger.info(f"Using provider_id from identity: {provider_id}")
+            logger.debug("Using provider_id from identity: %s", provider_id)
         
         service_request = {
             "provider_id": provider_id,
             "type": service_type
         }
         
-        logger.info(f"Final service request payload: {service_request}")
+        logger.debug("Final service request payload: %s", service_request)
         
-        node_api = NodeAPI(node['ip'], node['port'], node['token'])
+        node_api = node_api_for(node)
         
         node_api.headers['Content-Type'] = 'application/json'
-        logger.info(f"Request headers: {node_api.headers}")
         
-        import json
         url = f"{node_api.base_url}/services"
-        logger.info(f"Making POST request to: {url}")
+        logger.debug("Making POST request to: %s", url)
         
-        response = requests.post(
-            url,
-            headers=node_api.headers,
-            data=json.dumps(service_request)
-        )
+        response = node_api.send('POST', '/services', data=json.dumps(service_request))
         
-        logger.info(f"Response status: {response.status_code}")
-        logger.info(f"Response headers: {response.headers}")
+        logger.debug("Response status: %s", response.status_code)
+        logger.debug("Response headers: %s", response.headers)
         
         try:
             response_text = response.text
-            logger.info(f"Response text: {response_text}")
+            logger.debug("Response text: %s", response_text)
             response_json = response.json()
-            logger.info(f"Response JSON: {response_json}")
+            logger.debug("Response JSON: %s", response_json)
         except Exception as e:
             logger.warning(f"Could not parse response as JSON: {e}")
             response_json = None
@@ -468,6 +2460,7 @@ def start_service(node_id):
         else:
             error_msg = response_json.get('error', {}).get('message') if response_json else response.text
             logger.error(f"Error starting service: {error_msg}")
+            forget_provider_id(node_id, error_msg)
             return jsonify({"error": f"Failed to start service: {error_msg}"}), response.status_code
                  
     except Exception as e:
@@ -484,7 +2477,7 @@ def stop_service(node_id):
     service_id = request.form.get('service_id')
     
     try:
-        node_api = NodeAPI(node['ip'], node['port'], node['token'])
+        node_api = node_api_for(node)
         node_api.stop_service(service_id)
         flash('Service stopped successfully', 'success')
     except Exception as e:
@@ -498,47 +2491,49 @@ def create_service(node_id):
     if not node:
         return jsonify({"error": "Node not found"}), 404
     
-    logger.info(f"\n=== Service Create Request for Node {node_id} ===")
-    logger.info(f"Request Content-Type: {request.headers.get('Content-Type')}")
-    logger.info(f"Request method: {request.method}")
+    logger.debug("Service create request for node %s", node_id)
+    logger.debug("Request Content-Type: %s", request.headers.get('Content-Type'))
+    logger.debug("Request method: %s", request.method)
     
     try:
         if request.is_json:
             data = request.json
-            logger.info(f"Received JSON data: {data}")
+            logger.debug("Received JSON data: %s", data)
         else:
             data = request.form.to_dict()
-            logger.info(f"Received form data: {data}")
+            logger.debug("Received form data: %s", data)
         
         service_type = data.get('service_type')
         provider_id = data.get('provider_id')
         
-        logger.info(f"Extracted: service_type={service_type}, provider_id={provider_id}")
+        logger.debug("Extracted: service_type=%s, provider_id=%s", service_type, provider_id)
         
         if not service_type:
             return jsonify({"error": "Service type is required"}), 400
         
         if not provider_id:
-            logger.info("No provider_id in request, getting from identities API")
-            node_api = NodeAPI(node['ip'], node['port'], node['token'])
-            identities = node_api.identity_list()
+            logger.debug("No provider_id in request, using the node's provider identity")
+            provider_id = provider_id_for(node_id, node_api_for(node))
             
-            if not identities or 'identities' not in identities or not identities['identities']:
+            if not provider_id:
                 return jsonify({"error": "No identities found on node"}), 400
             
-            provider_id = identities['identities'][0]['id']
-            logger.info(f"Using provider_id from identity: {provider_id}")
+            logger.debug("Using provider_id from identity: %s", provider_id)
         
         service_request = {
             "provider_id": provider_id,
             "type": service_type
         }
         
-        logger.info(f"Final service request payload: {service_request}")
+        logger.debug("Final service request payload: %s", service_request)
         
-        node_api = NodeAPI(node['ip'], node['port'], node['token'])
+        node_api = node_api_for(node)
         
-        result = node_api.start_service(service_request)
+        try:
+            result = node_api.start_service(service_request)
+        except Exception as e:
+            forget_provider_id(node_id, e)
+            raise
         return jsonify({"success": True, "service": result})
                  
     except Exception as e:
@@ -547,76 +2542,540 @@ def create_service(node_id):
 
 @app.route('/remove_node/<int:node_id>', methods=['POST'])
 def remove_node(node_id):
-    nodes = get_nodes()
-    for i, node in enumerate(nodes):
-        if node.get('id') == node_id:
-            del nodes[i]
-            save_nodes(nodes)
-            flash(f'Node {node["name"]} removed successfully', 'success')
-            break
+    node = node_registry.remove(node_id)
+    if node:
+        node_snapshots.drop(node_id)
+        session_store.forget(node_id)
+        earnings_engine.forget(node_id)
+        metrics_history.forget(node_id)
+        flash(f'Node {node["name"]} removed successfully', 'success')
     return redirect(url_for('index'))
 
-cmc_cache = {
-    'data': None,
-    'last_updated': None
-}
+class PriceCache:
+    """The MYST quote, shared by every worker process through SQLite, with a history of price points.
+
+    A quote younger than ttl is served as is. Up to stale_ttl it is still served
+    while one worker, holding a lease on the price_cache row, refreshes it in the
+    background. Older or missing quotes are fetched by the request itself.
+    """
+    
+    LEASE_SECONDS = 60
+    
+    def __init__(self, slug, ttl, stale_ttl, history_days):
+        self.slug = slug
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.history_days = history_days
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'refreshes': 0, 'errors': 0}
+    
+    def count(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.stats[key] += 1
+    
+    def lookup(self):
+        """The cached quote and its state: 'fresh', 'stale' (serve it, but refresh) or None (fetch now)"""
+        row = get_db().execute("SELECT data, fetched_at FROM price_cache WHERE slug = ?", (self.slug,)).fetchone()
+        age = time.time() - row['fetched_at'] if row else None
+        if age is not None and age < self.ttl:
+            self.count('hits')
+            return json.loads(row['data']), 'fresh'
+        if age is not None and age < self.stale_ttl:
+            self.count('hits', 'stale')
+            return json.loads(row['data']), 'stale'
+        self.count('misses')
+        return None, None
+    
+    def claim_refresh(self):
+        """Take the refresh lease: True for one caller across all processes until it stores a quote or the lease ends"""
+        now = time.time()
+        conn = get_db()
+        with conn:
+            return conn.execute(
+                """UPDATE price_cache SET refresh_until = ?
+                   WHERE slug = ? AND (refresh_until IS NULL OR refresh_until < ?)""",
+                (now + self.LEASE_SECONDS, self.slug, now)
+            ).rowcount == 1
+    
+    def store(self, quote):
+        now = time.time()
+        conn = get_db()
+        with conn:
+            conn.execute(
+                """INSERT INTO price_cache (slug, data, fetched_at, refresh_until) VALUES (?, ?, ?, NULL)
+                   ON CONFLICT(slug) DO UPDATE SET data = excluded.data, fetched_at = excluded.fetched_at,
+                   refresh_until = NULL""",
+                (self.slug, json.dumps(quote), now)
+            )
+            if quote.get('price') is not None:
+                conn.execute("INSERT OR REPLACE INTO price_history (slug, ts, price) VALUES (?, ?, ?)",
+                             (self.slug, int(now), quote['price']))
+            conn.execute("DELETE FROM price_history WHERE slug = ? AND ts < ?",
+                         (self.slug, int(now - self.history_days * 86400)))
+    
+    def history(self, since):
+        rows = get_db().execute("SELECT ts, price FROM price_history WHERE slug = ? AND ts >= ? ORDER BY ts",
+                                (self.slug, int(since))).fetchall()
+        return [[row['ts'], row['price']] for row in rows]
+    
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
+
+price_cache = PriceCache('mysterium', Config.PRICE_TTL, Config.PRICE_STALE_TTL, Config.PRICE_HISTORY_DAYS)
+
+CMC_QUOTES_URL = f"{Config.CMC_API_URL}/v2/cryptocurrency/quotes/latest?slug=mysterium"
+
+def parse_myst_price(data):
+    """Extract the MYST quote from a CoinMarketCap response and cache it; None if it holds no quote"""
+    if 'data' in data and data['data']:
+        coin_data = list(data['data'].values())[0]
+        processed_data = {
+            'name': coin_data['name'],
+            'symbol': coin_data['symbol'],
+            'price': coin_data['quote']['USD']['price'],
+            'percent_change_1h': coin_data['quote']['USD']['percent_change_1h'],
+            'percent_change_24h': coin_data['quote']['USD']['percent_change_24h'],
+            'percent_change_7d': coin_data['quote']['USD']['percent_change_7d'],
+            'percent_change_30d': coin_data['quote']['USD']['percent_change_30d'],
+            'volume_24h': coin_data['quote']['USD']['volume_24h'],
+            'volume_change_24h': coin_data['quote']['USD']['volume_change_24h'],
+            'market_cap': coin_data['quote']['USD']['market_cap'],
+            'fully_diluted_market_cap': coin_data['quote']['USD']['fully_diluted_market_cap'],
+            'max_supply': coin_data['max_supply'],
+            'circulating_supply': coin_data['circulating_supply'],
+            'total_supply': coin_data['total_supply'],
+            'last_updated': coin_data['quote']['USD']['last_updated']
+        }
+        
+        price_cache.store(processed_data)
+        return processed_data
+    return None
+
+def fetch_myst_price(api_key):
+    """Fetch the MYST quote from CoinMarketCap and cache it; returns (status, payload)"""
+    headers = {
+        'X-CMC_PRO_API_KEY': api_key,
+        'Accept': 'application/json'
+    }
+    
+    parts = urlsplit(CMC_QUOTES_URL)
+    http_session = get_http_session(parts.hostname, parts.port or parts.scheme)
+    response = upstream_metrics.timed(
+        'coinmarketcap', parts.netloc, 'GET /v2/cryptocurrency/quotes/latest',
+        lambda: http_session.get(CMC_QUOTES_URL, headers=headers,
+                                 timeout=(Config.NODE_CONNECT_TIMEOUT, Config.NODE_READ_TIMEOUT)))
+    
+    if response.status_code != 200:
+        return response.status_code, {"error": f"CoinMarketCap API error: {response.text}"}
+    
+    processed_data = parse_myst_price(response.json())
+    if processed_data:
+        return 200, processed_data
+    return 404, {"error": "No data found for Mysterium token"}
+
+def refresh_myst_price(api_key):
+    """Background refresh of a stale quote; on failure the lease simply runs out and a later request retries"""
+    try:
+        status, payload = fetch_myst_price(api_key)
+    except Exception as e:
+        status, payload = None, {'error': str(e)}
+    price_cache.count('refreshes' if status == 200 else 'errors')
+    if status != 200:
+        logger.warning(f"MYST price refresh failed: {payload.get('error')}")
 
 @app.route('/api/myst-price')
 def myst_price():
-    if cmc_cache['data'] and cmc_cache['last_updated'] and \
-       datetime.now() - cmc_cache['last_updated'] < timedelta(minutes=10):
-        return jsonify(cmc_cache['data'])
-    
     api_key = request.args.get('api_key', '')
     if not api_key:
         return jsonify({"error": "API key is required"}), 400
     
     try:
-        headers = {
-            'X-CMC_PRO_API_KEY': api_key,
-            'Accept': 'application/json'
-        }
-        
-        response = requests.get(
-            'https://pro-api.coinmarketcap.com/v2/cryptocurrency/quotes/latest?slug=mysterium',
-            headers=headers
-        )
+        quote, state = price_cache.lookup()
+        if state == 'stale' and price_cache.claim_refresh():
+            threading.Thread(target=contextvars.copy_context().run, args=(refresh_myst_price, api_key),
+                             name='price-refresh', daemon=True).start()
+        if quote:
+            return conditional_json(payload_etag(quote), lambda: quote)
         
-        if response.status_code != 200:
-            return jsonify({"error": f"CoinMarketCap API error: {response.text}"}), response.status_code
-        
-        data = response.json()
-        
-        if 'data' in data and data['data']:
-            coin_data = list(data['data'].values())[0]
-            processed_data = {
-                'name': coin_data['name'],
-                'symbol': coin_data['symbol'],
-                'price': coin_data['quote']['USD']['price'],
-                'percent_change_1h': coin_data['quote']['USD']['percent_change_1h'],
-                'percent_change_24h': coin_data['quote']['USD']['percent_change_24h'],
-                'percent_change_7d': coin_data['quote']['USD']['percent_change_7d'],
-                'percent_change_30d': coin_data['quote']['USD']['percent_change_30d'],
-                'volume_24h': coin_data['quote']['USD']['volume_24h'],
-                'volume_change_24h': coin_data['quote']['USD']['volume_change_24h'],
-                'market_cap': coin_data['quote']['USD']['market_cap'],
-                'fully_diluted_market_cap': coin_data['quote']['USD']['fully_diluted_market_cap'],
-                'max_supply': coin_data['max_supply'],
-                'circulating_supply': coin_data['circulating_supply'],
-                'total_supply': coin_data['total_supply'],
-                'last_updated': coin_data['quote']['USD']['last_updated']
-            }
-            
-            cmc_cache['data'] = processed_data
-            cmc_cache['last_updated'] = datetime.now()
-            
-            return jsonify(processed_data)
-        else:
-            return jsonify({"error": "No data found for Mysterium token"}), 404
+        # Concurrent misses with the same key share one upstream call
+        status, payload = single_flight.do(('myst_price', api_key), lambda: fetch_myst_price(api_key),
+                                           endpoint='coinmarketcap')
+        if status == 200:
+            return conditional_json(payload_etag(payload), lambda: payload)
+        price_cache.count('errors')
+        return jsonify(payload), status
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/myst-price/history')
+def myst_price_history():
+    """MYST price points as [unix time, USD price] pairs over the last ?days=N (default 30)"""
+    try:
+        days = float(request.args.get('days', 30))
+    except ValueError:
+        return jsonify({'error': 'days must be a number'}), 400
+    if not math.isfinite(days):
+        return jsonify({'error': 'days must be a finite number'}), 400
+    # Points older than PRICE_HISTORY_DAYS have been pruned anyway
+    days = max(0, min(days, Config.PRICE_HISTORY_DAYS))
+    return jsonify({'points': price_cache.history(time.time() - days * 86400)})
+
+EARNINGS_GROUPS = ('node', 'service_type', 'country', 'day')
+EARNINGS_METRICS = ('sessions', 'tokens', 'bytes_sent', 'bytes_received', 'duration', 'usd')
+
+class EarningsEngine:
+    """Fleet earnings and traffic totals computed with NumPy over the local session store.
+
+    Each node's sessions are kept as column arrays bucketed by (day, service type,
+    country). Sessions older than SESSION_OPEN_LOOKBACK_DAYS are never rewritten by
+    the sync, so that part is read from SQLite once and only extended as the
+    cutoff moves; the recent part is re-read on every query. Nodes whose sessions
+    have not been synced yet fall back to their cached stats-daily buckets.
+    """
+    UNKNOWN = 'unknown'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frozen = {}
+        self.codes = {'service_type': {}, 'country': {}}
+        self.labels = {'service_type': [], 'country': []}
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def encode(self, kind, values):
+        """Integer codes for string values; codes are stable for the life of the process"""
+        uniques, inverse = np.unique(np.array(values, dtype=str), return_inverse=True)
+        with self.lock:
+            codes = self.codes[kind]
+            for value in uniques.tolist():
+                if value not in codes:
+                    codes[value] = len(self.labels[kind])
+                    self.labels[kind].append(value)
+            mapped = np.array([codes[value] for value in uniques.tolist()], dtype=np.int64)
+        return mapped[inverse] if len(values) else np.zeros(0, dtype=np.int64)
+
+    KEYS = ('node_id', 'day', 'service_type', 'country')
+
+    @staticmethod
+    def empty():
+        columns = {key: np.zeros(0, dtype=np.int64) for key in EarningsEngine.KEYS}
+        columns.update((metric, np.zeros(0)) for metric in EARNINGS_METRICS if metric != 'usd')
+        return columns
+
+    @staticmethod
+    def concat(parts):
+        parts = [part for part in parts if len(part['day'])]
+        if not parts:
+            return EarningsEngine.empty()
+        if len(parts) == 1:
+            return parts[0]
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    @staticmethod
+    def bucket(columns):
+        """Sum rows sharing a (node, day, service type, country) key into one row"""
+        if not len(columns['day']):
+            return columns
+        keys = np.zeros(len(columns['day']), dtype=np.int64)
+        for name in EarningsEngine.KEYS:
+            values = columns[name] - columns[name].min()
+            keys = keys * (int(values.max()) + 1) + values
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        bucketed = {name: columns[name][first] for name in EarningsEngine.KEYS}
+        bucketed.update((name, np.bincount(inverse, weights=values, minlength=len(first)))
+                        for name, values in columns.items() if name not in bucketed)
+        return bucketed
+
+    def load(self, node_ids, since, until=None):
+        """Bucketed session columns of the nodes for created_at in [since, until), open ended when until is None"""
+        rows = []
+        for start in range(0, len(node_ids), 500):
+            chunk = node_ids[start:start + 500]
+            rows.extend(get_db().execute(
+                f"""SELECT node_id, substr(created_at, 1, 10), service_type, consumer_country,
+                           tokens, bytes_sent, bytes_received, duration
+                    FROM sessions WHERE node_id IN ({', '.join('?' * len(chunk))})
+                    AND created_at >= ? AND created_at < ?""",
+                list(chunk) + [since, until or '~']
+            ).fetchall())
+        if not rows:
+            return self.empty()
+        ids, days, services, countries, tokens, sent, received, duration = zip(*rows)
+        return self.bucket({
+            'node_id': np.array(ids, dtype=np.int64),
+            'day': np.array(days, dtype='datetime64[D]').astype(np.int64),
+            'service_type': self.encode('service_type', [value or self.UNKNOWN for value in services]),
+            'country': self.encode('country', [value or self.UNKNOWN for value in countries]),
+            'sessions': np.ones(len(rows)),
+            'tokens': np.array(tokens, dtype=float),
+            'bytes_sent': np.array(sent, dtype=float),
+            'bytes_received': np.array(received, dtype=float),
+            'duration': np.array(duration, dtype=float)
+        })
+
+    def frozen_columns(self, node, cutoff):
+        """The node's sessions created before cutoff, loaded once and extended as the cutoff moves"""
+        with self.lock:
+            entry = self.frozen.get(node['id'])
+            if entry is not None and entry['created_at'] != node.get('created_at'):
+                # The id was reused by a node added after the old one was removed
+                entry = None
+            self.stats['hits' if entry and entry['until'] >= cutoff else 'misses'] += 1
+        if entry is None or entry['until'] < cutoff:
+            since = entry['until'] if entry else ''
+            columns = self.concat([entry['columns'] if entry else self.empty(), self.load([node['id']], since, cutoff)])
+            entry = {'created_at': node.get('created_at'), 'until': cutoff, 'columns': columns}
+            with self.lock:
+                self.frozen[node['id']] = entry
+        return entry['columns']
+
+    def daily_stats_columns(self, node):
+        """Columns from the node's cached stats-daily buckets, without service type or country"""
+        snapshot = node_snapshots.latest(node['id'], 'data')
+        items = ((snapshot['value'].get('stats_daily') if snapshot else None) or {}).get('items') or {}
+        if not items:
+            return None
+        days = list(items)
+        stats = [items[day] or {} for day in days]
+        unknown = [self.UNKNOWN] * len(days)
+        return {
+            'node_id': np.full(len(days), node['id'], dtype=np.int64),
+            'day': np.array(days, dtype='datetime64[D]').astype(np.int64),
+            'service_type': self.encode('service_type', unknown),
+            'country': self.encode('country', unknown),
+            'sessions': np.array([item.get('count', 0) for item in stats], dtype=float),
+            'tokens': np.array([item.get('sum_tokens', 0) for item in stats], dtype=float),
+            'bytes_sent': np.array([item.get('sum_bytes_sent', 0) for item in stats], dtype=float),
+            'bytes_received': np.array([item.get('sum_bytes_received', 0) for item in stats], dtype=float),
+            'duration': np.array([item.get('sum_duration', 0) for item in stats], dtype=float)
+        }
+
+    @staticmethod
+    def lifetime(node):
+        """All-time totals from the node's cached stats-aggregated section, if any"""
+        snapshot = node_snapshots.latest(node['id'], 'data')
+        stats = ((snapshot['value'].get('stats') if snapshot else None) or {}).get('stats')
+        if not stats:
+            return None
+        return {
+            'sessions': stats.get('count', 0),
+            'earnings': round((stats.get('sum_tokens') or 0) / 10**18, 6),
+            'bytes_sent': stats.get('sum_bytes_sent', 0),
+            'bytes_received': stats.get('sum_bytes_received', 0),
+            'duration': stats.get('sum_duration', 0)
+        }
+
+    @staticmethod
+    def usd_column(day, tokens, first_day):
+        """USD value of each row at its day's closing price from the local price history; None without prices"""
+        points = get_db().execute(
+            """SELECT ts, price FROM price_history WHERE slug = ? AND ts >= COALESCE(
+                   (SELECT MAX(ts) FROM price_history WHERE slug = ? AND ts <= ?), 0) ORDER BY ts""",
+            (price_cache.slug, price_cache.slug, int(first_day) * 86400)
+        ).fetchall()
+        if not points:
+            return None
+        ts, prices = (np.array(column, dtype=float) for column in zip(*points))
+        index = np.searchsorted(ts, (day + 1) * 86400, side='left') - 1
+        return tokens / 10**18 * prices[np.clip(index, 0, len(prices) - 1)]
+
+    @staticmethod
+    def totals(sums, index):
+        usd = sums.get('usd')
+        return {
+            'sessions': int(sums['sessions'][index]),
+            'earnings': round(float(sums['tokens'][index]) / 10**18, 6),
+            'earnings_usd': round(float(usd[index]), 2) if usd is not None else None,
+            'bytes_sent': int(sums['bytes_sent'][index]),
+            'bytes_received': int(sums['bytes_received'][index]),
+            'duration': int(sums['duration'][index])
+        }
+
+    def aggregate(self, nodes, days, group_by=EARNINGS_GROUPS):
+        """Totals over the last `days` UTC days for the whole fleet and per requested grouping"""
+        today = np.datetime64(datetime.utcnow().strftime('%Y-%m-%d'), 'D').astype(np.int64)
+        first_day = today - days + 1
+        cutoff = (datetime.utcnow() - timedelta(days=Config.SESSION_OPEN_LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+
+        synced = session_store.synced_node_ids()
+        parts, sources = [], []
+        for node in nodes:
+            if node['id'] in synced:
+                parts.append(self.frozen_columns(node, cutoff))
+                sources.append('sessions')
+            else:
+                columns = self.daily_stats_columns(node)
+                parts.append(columns if columns is not None else self.empty())
+                sources.append('daily_stats' if columns is not None else None)
+        parts.append(self.load([node['id'] for node in nodes if node['id'] in synced], cutoff))
+
+        columns = self.concat(parts)
+        positions = np.full(max([node['id'] for node in nodes], default=0) + 1, -1, dtype=np.int64)
+        positions[[node['id'] for node in nodes]] = np.arange(len(nodes))
+        columns['node'] = positions[columns['node_id']]
+        in_range = (columns['day'] >= first_day) & (columns['day'] <= today)
+        columns = {name: values[in_range] for name, values in columns.items()}
+        usd = self.usd_column(columns['day'], columns['tokens'], first_day)
+        if usd is not None:
+            columns['usd'] = usd
+        metrics = [metric for metric in EARNINGS_METRICS if metric in columns]
+
+        def sums_by(keys, size):
+            return {metric: np.bincount(keys, weights=columns[metric], minlength=size) for metric in metrics}
+
+        result = {
+            'days': days,
+            'date_from': str(np.datetime64(int(first_day), 'D')),
+            'date_to': str(np.datetime64(int(today), 'D')),
+            'totals': self.totals(sums_by(np.zeros(len(columns['day']), dtype=np.int64), 1), 0)
+        }
+        if 'node' in group_by:
+            sums = sums_by(columns['node'], len(nodes))
+            result['by_node'] = [
+                dict(self.totals(sums, i), id=node['id'], name=node['name'], source=sources[i],
+                     lifetime=self.lifetime(node))
+                for i, node in enumerate(nodes)
+            ]
+        for kind in ('service_type', 'country'):
+            if kind in group_by:
+                with self.lock:
+                    labels = list(self.labels[kind])
+                sums = sums_by(columns[kind], len(labels))
+                result[f'by_{kind}'] = [
+                    dict(self.totals(sums, i), **{kind: label})
+                    for i, label in enumerate(labels) if sums['sessions'][i]
+                ]
+        if 'day' in group_by:
+            sums = sums_by(columns['day'] - first_day, days)
+            result['by_day'] = [
+                dict(self.totals(sums, i), day=str(np.datetime64(int(first_day + i), 'D')))
+                for i in range(days)
+            ]
+        return result
+
+    def forget(self, node_id):
+        with self.lock:
+            self.frozen.pop(node_id, None)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, nodes=len(self.frozen),
+                        buckets=sum(len(entry['columns']['day']) for entry in self.frozen.values()))
+
+earnings_engine = EarningsEngine()
+
+@app.route('/api/fleet/earnings')
+def fleet_earnings():
+    """Fleet earnings and traffic over the last ?days=N UTC days (default 30).
+
+    ?group_by= is a comma separated subset of node, service_type, country and day
+    (all by default). Earnings are in MYST, earnings_usd uses the recorded price
+    of each day and is null until a price has been fetched.
+    """
+    try:
+        days = int(request.args.get('days', 30))
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
+    days = max(1, min(days, Config.EARNINGS_MAX_DAYS))
+    group_by = [group for group in request.args.get('group_by', ','.join(EARNINGS_GROUPS)).split(',') if group]
+    unknown = [group for group in group_by if group not in EARNINGS_GROUPS]
+    if unknown:
+        return jsonify({'error': f"Unknown group_by: {', '.join(unknown)}; expected {', '.join(EARNINGS_GROUPS)}"}), 400
+
+    started = time.perf_counter()
+    try:
+        result = earnings_engine.aggregate(get_nodes(), days, group_by)
+    except Exception as e:
+        logger.error(f"Error aggregating fleet earnings: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return jsonify(result)
+
+@app.route('/api/http-pool')
+def http_pool():
+    return jsonify(get_http_pool_stats())
+
+@app.route('/api/circuit-breakers')
+def circuit_breaker_stats():
+    return jsonify(circuit_breaker.get_stats())
+
+@app.route('/api/single-flight')
+def single_flight_stats():
+    return jsonify(single_flight.get_stats())
+
+@app.route('/api/tokens')
+def token_stats():
+    """Token expiry per node (never the tokens themselves) and renewal counters"""
+    nodes = []
+    for node in get_nodes():
+        expiry = token_expiry(node['token'])
+        nodes.append({
+            'id': node['id'],
+            'name': node['name'],
+            'expires_at': datetime.fromtimestamp(expiry).isoformat() if expiry else None,
+            'renewable': bool(node.get('password_encrypted'))
+        })
+    return jsonify(dict(token_manager.get_stats(), nodes=nodes))
+
+def cache_stats():
+    """Hit/miss counters of the in-process caches, with their hit rates"""
+    http_pool = get_http_pool_stats()
+    caches = {
+        'node_snapshots': node_snapshots.get_stats(),
+        'discovery': discovery_cache.get_stats(),
+        'myst_price': price_cache.get_stats(),
+        'earnings': earnings_engine.get_stats(),
+        'http_sessions': {'hits': http_pool['hits'], 'misses': http_pool['misses']}
+    }
+    for stats in caches.values():
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else None
+    return caches
+
+def render_prometheus_metrics():
+    lines = upstream_metrics.prometheus_lines()
+    caches = cache_stats()
+    for name, field in (('dashboard_cache_hits_total', 'hits'), ('dashboard_cache_misses_total', 'misses')):
+        lines.append(f'# TYPE {name} counter')
+        for cache, stats in sorted(caches.items()):
+            lines.append(f'{name}{{{prometheus_labels(cache=cache)}}} {stats[field]}')
+    flights = single_flight.get_stats()
+    lines.append('# TYPE dashboard_singleflight_calls_total counter')
+    lines.append(f'dashboard_singleflight_calls_total {flights["calls"]}')
+    lines.append('# TYPE dashboard_singleflight_coalesced_total counter')
+    for endpoint, count in sorted(flights['coalesced_by_endpoint'].items()):
+        lines.append(f'dashboard_singleflight_coalesced_total{{{prometheus_labels(endpoint=endpoint)}}} {count}')
+    breakers = circuit_breaker.get_stats()
+    lines.append('# TYPE dashboard_circuit_breaker_open gauge')
+    for node, state in sorted(breakers['nodes'].items()):
+        lines.append(f'dashboard_circuit_breaker_open{{{prometheus_labels(node=node)}}} {int(state["open"])}')
+    lines.append('# TYPE dashboard_circuit_breaker_short_circuited_total counter')
+    lines.append(f'dashboard_circuit_breaker_short_circuited_total {breakers["short_circuited"]}')
+    lines.append('# TYPE dashboard_http_connections_reused_total counter')
+    for host, stats in sorted(get_http_pool_stats()['hosts'].items()):
+        lines.append(f'dashboard_http_connections_reused_total{{{prometheus_labels(host=host)}}} {stats["connections_reused"]}')
+    return '\n'.join(lines) + '\n'
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(render_prometheus_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/upstream-metrics')
+def upstream_metrics_stats():
+    return jsonify({'upstreams': upstream_metrics.summary(), 'caches': cache_stats()})
+
+@app.route('/debug/metrics')
+def debug_metrics():
+    return render_template('debug/metrics.html',
+                           title='Performance Metrics',
+                           upstreams=upstream_metrics.summary(),
+                           caches=cache_stats(),
+                           single_flight=single_flight.get_stats(),
+                           breakers=circuit_breaker.get_stats(),
+                           http_pool=get_http_pool_stats())
+
 @app.route('/node/<int:node_id>/connection_stats')
 def connection_stats(node_id):
     node = get_node_by_id(node_id)
@@ -624,14 +3083,13 @@ def connection_stats(node_id):
         return jsonify({'error': 'Node not found'}), 404
     
     try:
-        node_api = NodeAPI(node['ip'], node['port'], node['token'])
-        stats = node_api.connection_statistics()
+        snapshot, cached = get_node_snapshot(node, 'connection_stats', fresh=wants_fresh())
+        stats = snapshot['value']
         
-        logger.info(f"\n=== Connection Statistics for node {node_id} ===")
-        logger.info(f"Stats: {json.dumps(stats, indent=2)}")
-        logger.info("=========================================\n")
+        if not cached:
+            log_dump('Connection statistics', node_id, stats)
         
-        return jsonify(stats)
+        return jsonify(dict(stats, **node_snapshots.markers(snapshot, cached)))
     except Exception as e:
         logger.error(f"Error getting connection stats: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -643,18 +3101,23 @@ def session_stats(node_id, session_id):
         return jsonify({'error': 'Node not found'}), 404
     
     try:
-        node_api = NodeAPI(node['ip'], node['port'], node['token'])
+        node_api = node_api_for(node)
         session_data = node_api.session_by_id(session_id)
         
-        logger.info(f"\n=== Session Stats for node {node_id}, session {session_id} ===")
-        logger.info(f"Data: {json.dumps(session_data, indent=2)}")
-        logger.info("=========================================\n")
+        log_dump('Session data', node_id, session_data)
         
         return jsonify(session_data)
     except Exception as e:
         logger.error(f"Error getting session stats: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def active_sessions_payload(snapshot, cached):
+    """The newest 100 sessions of a node data snapshot"""
+    sessions = snapshot['value']['sessions']
+    if sessions and 'items' in sessions:
+        sessions = dict(sessions, items=sessions['items'][:100])
+    return dict({'sessions': sessions}, **node_snapshots.markers(snapshot, cached))
+
 @app.route('/node/<int:node_id>/active_sessions')
 def node_active_sessions(node_id):
     node = get_node_by_id(node_id)
@@ -662,17 +3125,54 @@ def node_active_sessions(node_id):
         return jsonify({'error': 'Node not found'}), 404
     
     try:
-        node_api = NodeAPI(node['ip'], node['port'], node['token'])
+        snapshot, cached = get_node_snapshot(node, 'data', fresh=wants_fresh())
         
-        sessions = node_api.sessions({"page_size": 100})
-        
-        logger.info(f"Fetching active sessions for node {node_id} without quality metrics")
+        logger.debug("Serving active sessions for node %s from %s", node_id, 'cache' if cached else 'a live fetch')
         
+        return conditional_json(node_snapshots.etag(snapshot, ['sessions'], 'active'),
+                                lambda: active_sessions_payload(snapshot, cached))
+    except Exception as e:
+        logger.error(f"Error getting active sessions data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/node/<int:node_id>/sessions')
+def node_sessions(node_id):
+    """Filtered, cursor-paginated sessions.
+
+    Query parameters: status, consumer_country, service_type (comma-separated),
+    date_from/date_to (YYYY-MM-DD) or days, limit, cursor (next_cursor of the
+    previous page), fields (comma-separated projection) and live=1 to bypass
+    the local session store.
+    """
+    node = get_node_by_id(node_id)
+    if not node:
+        return jsonify({'error': 'Node not found'}), 404
+    
+    try:
+        filters, limit, cursor, fields = parse_session_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': f"Invalid query: {str(e)}"}), 400
+    
+    try:
+        if request.args.get('live') not in ('1', 'true', 'yes') and session_store.is_synced(node_id):
+            rows = session_store.query(node_id, filters, limit, cursor)
+            source = 'store'
+        else:
+            node_api = node_api_for(node)
+            rows = query_sessions_live(node_api, filters, limit, cursor)
+            source = 'live'
+        items = rows[:limit]
+        next_cursor = encode_session_cursor(items[-1]) if len(rows) > limit else None
+        if fields:
+            items = [{field: item.get(field) for field in fields} for item in items]
         return jsonify({
-            'sessions': sessions
+            'items': items,
+            'next_cursor': next_cursor,
+            'source': source,
+            'filters': filters
         })
     except Exception as e:
-        logger.error(f"Error getting active sessions data: {str(e)}")
+        logger.error(f"Error querying sessions for node {node_id}: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/node/<int:node_id>/services/<string:service_id>', methods=['DELETE'])
@@ -682,14 +3182,13 @@ def delete_service(node_id, service_id):
         return jsonify({"error": "Node not found"}), 404
     
     try:
-        logger.info(f"\n=== Service Stop Request for Node {node_id} ===")
-        logger.info(f"Stopping service with ID: {service_id}")
+        logger.debug("Service stop request for node %s, service %s", node_id, service_id)
         
-        node_api = NodeAPI(node['ip'], node['port'], node['token'])
+        node_api = node_api_for(node)
         
         result = node_api.stop_service(service_id)
         
-        logger.info(f"Service {service_id} stopped successfully")
+        logger.info("Service %s stopped on node %s", service_id, node_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         logger.error(f"Exception stopping service: {str(e)}")
@@ -720,13 +3219,11 @@ def update_node_password():
         node_api = NodeAPI(node['ip'], node['port'])
         token = node_api.authenticate(new_password)
         
-        nodes = get_nodes()
-        for n in nodes:
-            if n.get('id') == node_id:
-                n['token'] = token
-                break
-                
-        save_nodes(nodes)
+        # A password change usually means a reinstalled node, which may carry a new identity
+        node_registry.update(node_id, token=token, provider_id=None,
+                             password_encrypted=credential_cipher.encrypt(new_password))
+        token_manager.reset(node_id)
+        node_snapshots.drop(node_id)
         
         if 'node_tokens' in session:
             node_tokens = session.get('node_tokens', {})
@@ -740,78 +3237,146 @@ def update_node_password():
     
     return redirect(url_for('index'))
 
-def get_help_topics():
-    """Get a list of all available help topics."""
-    help_dir = os.path.join(os.path.dirname(__file__), 'help_content')
-    topics = []
+HELP_DIR = os.path.join(os.path.dirname(__file__), 'help_content')
+
+class HelpContentCache:
+    """Help topics parsed, Markdown-rendered and page-rendered once per content version.
+
+    The help_content directory is re-checked by file mtimes at most every
+    check_interval seconds; any change reloads everything and changes the ETag.
+    """
     
-    logger.info(f"\n=== Searching for help topics in: {help_dir} ===")
+    def __init__(self, help_dir, check_interval):
+        self.help_dir = help_dir
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.signature = None
+        self.last_checked = 0
+        self.topics = []
+        self.topic_data = {}
+        self.pages = {}
+        self.etag = None
+        self.last_modified = None
     
-    if not os.path.exists(help_dir):
-        logger.warning(f"Help content directory not found at: {help_dir}")
-        try:
-            os.makedirs(help_dir)
-            logger.info(f"Created help_content directory at: {help_dir}")
-        except Exception as e:
-            logger.error(f"Error creating help_content directory: {e}")
-        return topics
+    def directory_signature(self):
+        entries = []
+        for filename in sorted(os.listdir(self.help_dir)):
+            if filename.endswith('.yaml'):
+                stat = os.stat(os.path.join(self.help_dir, filename))
+                entries.append((filename, stat.st_mtime_ns, stat.st_size))
+        return tuple(entries)
     
-    try:
-        all_files = os.listdir(help_dir)
-        logger.info(f"Found {len(all_files)} files in help_content directory:")
-        for file in all_files:
-            logger.info(f"  - {file}")
-    except Exception as e:
-        logger.error(f"Error listing help content directory: {e}")
-        return topics
+    def ensure_loaded(self):
+        if self.signature is not None and time.time() - self.last_checked < self.check_interval:
+            return
+        with self.lock:
+            if not os.path.exists(self.help_dir):
+                logger.warning(f"Help content directory not found at: {self.help_dir}")
+                try:
+                    os.makedirs(self.help_dir)
+                    logger.info(f"Created help_content directory at: {self.help_dir}")
+                except Exception as e:
+                    logger.error(f"Error creating help_content directory: {e}")
+            try:
+                signature = self.directory_signature()
+            except Exception as e:
+                logger.error(f"Error listing help content directory: {e}")
+                signature = ()
+            self.last_checked = time.time()
+            if signature != self.signature:
+                self.load(signature)
     
-    for filename in all_files:
-        if filename.endswith('.yaml'):
+    def load(self, signature):
+        logger.info(f"Loading help topics from: {self.help_dir}")
+        topics = []
+        topic_data = {}
+        for filename, _, _ in signature:
             topic_id = filename[:-5]
-            
             try:
-                with open(os.path.join(help_dir, filename), 'r') as file:
-                    topic_data = yaml.safe_load(file)
-                    
-                if not topic_data:
+                with open(os.path.join(self.help_dir, filename), 'r') as file:
+                    data = yaml.safe_load(file)
+                
+                if not data:
                     logger.warning(f"Error: Empty or invalid YAML in {filename}")
                     continue
                 
-                if 'color' not in topic_data or not topic_data['color']:
-                    topic_data['color'] = 'primary'
-                    
+                if 'color' not in data or not data['color']:
+                    data['color'] = 'primary'
+                
+                for section in data.get('content_sections') or []:
+                    if 'content' in section:
+                        section['content'] = markdown.markdown(
+                            section['content'], 
+                            extensions=['tables', 'fenced_code', 'nl2br']
+                        )
+                
                 topics.append({
                     'id': topic_id,
-                    'title': topic_data.get('title', topic_id),
-                    'description': topic_data.get('description', ''),
-                    'color': topic_data.get('color', 'primary'),
-                    'thumbnail_url': topic_data.get('thumbnail_url', '')
+                    'title': data.get('title', topic_id),
+                    'description': data.get('description', ''),
+                    'color': data.get('color', 'primary'),
+                    'thumbnail_url': data.get('thumbnail_url', '')
                 })
-                logger.info(f"Successfully loaded help topic: {topic_id} - {topic_data.get('title')} with color {topic_data.get('color', 'primary')}")
+                topic_data[topic_id] = data
             except Exception as e:
                 logger.error(f"Error loading help topic {filename}: {e}")
+        
+        self.topics = topics
+        self.topic_data = topic_data
+        self.pages = {}
+        self.signature = signature
+        self.etag = hashlib.sha1(repr(signature).encode()).hexdigest()
+        newest = max((mtime for _, mtime, _ in signature), default=time.time_ns())
+        self.last_modified = datetime.utcfromtimestamp(newest // 10**9)
+        logger.info(f"Total help topics loaded: {len(topics)}")
     
-    logger.info(f"Total help topics loaded: {len(topics)}")
-    return topics
+    def page(self, key, render):
+        """Rendered page HTML for key, rendered at most once per content version"""
+        html = self.pages.get(key)
+        if html is None:
+            html = render()
+            self.pages[key] = html
+        return html
+
+help_cache = HelpContentCache(HELP_DIR, Config.HELP_CHECK_INTERVAL)
+
+def get_help_topics():
+    """Get a list of all available help topics."""
+    help_cache.ensure_loaded()
+    return help_cache.topics
 
 def get_help_topic(topic_id):
-    """Get content for a specific help topic."""
-    help_file = os.path.join(os.path.dirname(__file__), 'help_content', f"{topic_id}.yaml")
-    
-    if not os.path.exists(help_file):
-        return None
-    
-    try:
-        with open(help_file, 'r') as file:
-            return yaml.safe_load(file)
-    except Exception as e:
-        logger.error(f"Error loading help topic {topic_id}: {e}")
-        return None
+    """Get content for a specific help topic, with its Markdown sections rendered to HTML."""
+    help_cache.ensure_loaded()
+    return help_cache.topic_data.get(topic_id)
+
+def serve_help_page(key, render):
+    """Serve a help page with ETag/Last-Modified, answering 304 or reusing the cached HTML when possible.
+
+    Pages with pending flash messages are rendered fresh so the messages are shown and consumed.
+    """
+    if session.get('_flashes'):
+        response = make_response(render())
+    else:
+        if request.if_none_match:
+            # If-Modified-Since is ignored when If-None-Match is sent (RFC 7232, section 6)
+            not_modified = request.if_none_match.contains_weak(help_cache.etag)
+        else:
+            not_modified = bool(request.if_modified_since and
+                                request.if_modified_since.replace(tzinfo=None) >= help_cache.last_modified)
+        if not_modified:
+            response = Response(status=304)
+        else:
+            response = make_response(help_cache.page(key, render))
+    response.set_etag(help_cache.etag)
+    response.last_modified = help_cache.last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/help')    
 def help_index():
     topics = get_help_topics()
-    return render_template('help/index.html', title='Help Center', topics=topics)
+    return serve_help_page(('index',), lambda: render_template('help/index.html', title='Help Center', topics=topics))
 
 @app.route('/help/<topic_id>')
 def help_topic(topic_id):
@@ -820,15 +3385,8 @@ def help_topic(topic_id):
         flash('Help topic not found', 'danger')
         return redirect(url_for('help_index'))
     
-    if topic_data and 'content_sections' in topic_data:
-        for section in topic_data['content_sections']:
-            if 'content' in section:
-                section['content'] = markdown.markdown(
-                    section['content'], 
-                    extensions=['tables', 'fenced_code', 'nl2br']
-                )
-    
-    return render_template('help/topic.html', title=f'Help: {topic_data.get("title")}', topic=topic_data)
+    return serve_help_page(('topic', topic_id), lambda: render_template(
+        'help/topic.html', title=f'Help: {topic_data.get("title")}', topic=topic_data))
 
 @app.context_processor
 def inject_now():
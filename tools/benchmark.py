@@ -0,0 +1,208 @@
+"""Load benchmark for the dashboard against a simulated fleet.
+
+Starts N fake Tequila nodes plus the discovery and CoinMarketCap stubs, runs
+the dashboard against them in a subprocess (Flask or the ASGI mode) with a
+throwaway database, then drives it with M concurrent clients and reports
+latency percentiles, throughput and the upstream calls it caused:
+
+    python tools/benchmark.py --nodes 20 --clients 50 --duration 15
+    python tools/benchmark.py --mode asgi --latency 0.2 --fresh
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, TOOLS_DIR)
+
+from cmc_stub import start_cmc_stub
+from discovery_stub import DiscoveryStubHandler, start_discovery_stub
+from fake_tequila import start_fake_fleet
+
+DEFAULT_PATHS = ['/', '/node/{id}/data', '/api/myst-price?api_key=benchmark']
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def seed_nodes(database_file, servers):
+    """Register the fake nodes in a fresh dashboard database"""
+    os.environ['DATABASE_FILE'] = database_file
+    # Run from the scratch directory so the one-time nodes.json import finds nothing to import
+    os.chdir(os.path.dirname(database_file))
+    sys.path.insert(0, ROOT_DIR)
+    import dashboard
+    for i, server in enumerate(servers):
+        dashboard.node_registry.add(f"bench-{i + 1}", '127.0.0.1', str(server.server_port), 'fake-token')
+    return [node['id'] for node in dashboard.get_nodes()]
+
+def start_dashboard(mode, port, env, log_file):
+    if mode == 'asgi':
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port), '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-m', 'flask', '--app', 'dashboard', 'run', '--port', str(port), '--with-threads']
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Dashboard exited with code {process.returncode}, see {log_file.name}")
+        try:
+            requests.get(f"{base_url}/help", timeout=1)
+            return process, base_url
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Dashboard did not start within 30s, see {log_file.name}")
+
+def label_for(template):
+    return template.split('?')[0].replace('{id}', '<id>')
+
+def run_clients(base_url, paths, node_ids, clients, duration, fresh):
+    """Hammer the dashboard for `duration` seconds; returns {label: [(latency_ms, ok, size)]}"""
+    results = defaultdict(list)
+    results_lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        http = requests.Session()
+        local = defaultdict(list)
+        while time.time() < stop_at:
+            template = rng.choice(paths)
+            path = template.replace('{id}', str(rng.choice(node_ids)))
+            if fresh and '{id}' in template:
+                path += ('&' if '?' in path else '?') + 'fresh=1'
+            started = time.perf_counter()
+            try:
+                response = http.get(base_url + path, timeout=60)
+                ok = response.status_code < 400
+                size = len(response.content)
+            except requests.exceptions.RequestException:
+                ok, size = False, 0
+            local[label_for(template)].append(((time.perf_counter() - started) * 1000, ok, size))
+        with results_lock:
+            for label, samples in local.items():
+                results[label].extend(samples)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def summarize(samples):
+    latencies = sorted(sample[0] for sample in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if not sample[1]),
+        'p50_ms': round(percentile(latencies, 50), 1),
+        'p95_ms': round(percentile(latencies, 95), 1),
+        'p99_ms': round(percentile(latencies, 99), 1),
+        'avg_bytes': round(sum(sample[2] for sample in samples) / len(samples)) if samples else 0
+    }
+
+def print_report(report):
+    config = report['config']
+    print(f"\n{config['mode']} mode, {config['nodes']} nodes x {config['clients']} clients, "
+          f"{config['duration']}s, node latency {config['latency']}s (+{config['jitter']}s jitter), "
+          f"error rate {config['error_rate']}, {config['sessions']} sessions/node")
+    print(f"{'endpoint':<24}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'avg bytes':>11}")
+    for label, row in report['endpoints'].items():
+        print(f"{label:<24}{row['requests']:>10}{row['errors']:>8}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['avg_bytes']:>11}")
+    print(f"\nthroughput: {report['throughput_rps']} req/s")
+    upstream = report['upstream']
+    print(f"upstream calls: tequila {upstream['tequila_total']}, discovery {upstream['discovery']}, "
+          f"coinmarketcap {upstream['coinmarketcap']} "
+          f"({upstream['tequila_per_request']} tequila calls per dashboard request)")
+    for path, count in sorted(upstream['tequila_by_path'].items(), key=lambda item: -item[1]):
+        print(f"  {path:<40}{count:>8}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard against a simulated Tequila fleet')
+    parser.add_argument('--mode', choices=['flask', 'asgi'], default='flask')
+    parser.add_argument('--nodes', type=int, default=10)
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=10, help='seconds of measured load')
+    parser.add_argument('--latency', type=float, default=0.05, help='fake node response latency (seconds)')
+    parser.add_argument('--jitter', type=float, default=0.02, help='extra random node latency (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of node calls that fail with 500')
+    parser.add_argument('--sessions', type=int, default=500, help='sessions per fake node')
+    parser.add_argument('--path', action='append', dest='paths',
+                        help=f"dashboard path to request, {{id}} is replaced by a node id (default: {DEFAULT_PATHS})")
+    parser.add_argument('--fresh', action='store_true', help='add fresh=1 to node routes, bypassing snapshots')
+    parser.add_argument('--poller', action='store_true', help='leave the background poller enabled')
+    parser.add_argument('--port', type=int, default=5055, help='port for the dashboard under test')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    servers = start_fake_fleet(args.nodes, latency=args.latency, jitter=args.jitter,
+                               error_rate=args.error_rate, sessions=args.sessions)
+    discovery = start_discovery_stub()
+    cmc = start_cmc_stub()
+
+    workdir = tempfile.mkdtemp(prefix='dashboard-bench-')
+    database_file = os.path.join(workdir, 'nodes.db')
+    node_ids = seed_nodes(database_file, servers)
+    env = dict(os.environ,
+               DATABASE_FILE=database_file,
+               POLLER_ENABLED='1' if args.poller else '0',
+               DISCOVERY_API_URL=f"http://127.0.0.1:{discovery.server_port}/api/v4",
+               CMC_API_URL=f"http://127.0.0.1:{cmc.server_port}")
+    log_file = open(os.path.join(workdir, 'dashboard.log'), 'w')
+    process, base_url = start_dashboard(args.mode, args.port, env, log_file)
+    print(f"Dashboard ({args.mode}) at {base_url}, log in {log_file.name}")
+
+    try:
+        for server in servers:
+            server.calls.clear()
+        discovery_before = DiscoveryStubHandler.requests_served
+        cmc_before = cmc.handler.requests_served
+        started = time.time()
+        results = run_clients(base_url, args.paths or DEFAULT_PATHS, node_ids, args.clients, args.duration, args.fresh)
+        elapsed = time.time() - started
+    finally:
+        process.terminate()
+        process.wait(10)
+        log_file.close()
+
+    by_path = Counter()
+    for server in servers:
+        by_path.update(server.calls)
+    total_requests = sum(len(samples) for samples in results.values())
+    endpoints = {label: summarize(samples) for label, samples in sorted(results.items())}
+    endpoints['all'] = summarize([sample for samples in results.values() for sample in samples])
+    report = {
+        'config': {
+            'mode': args.mode, 'nodes': args.nodes, 'clients': args.clients, 'duration': args.duration,
+            'latency': args.latency, 'jitter': args.jitter, 'error_rate': args.error_rate,
+            'sessions': args.sessions, 'fresh': args.fresh, 'poller': args.poller
+        },
+        'endpoints': endpoints,
+        'throughput_rps': round(total_requests / elapsed, 1) if elapsed else 0,
+        'upstream': {
+            'tequila_total': sum(by_path.values()),
+            'tequila_by_path': dict(by_path),
+            'tequila_per_request': round(sum(by_path.values()) / total_requests, 2) if total_requests else 0,
+            'discovery': DiscoveryStubHandler.requests_served - discovery_before,
+            'coinmarketcap': cmc.handler.requests_served - cmc_before
+        }
+    }
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,104 @@
+"""Local stand-in for the CoinMarketCap quotes API.
+
+Answers /v2/cryptocurrency/quotes/latest with a fixed MYST quote for any API
+key, so the price widget can be exercised without a real key:
+
+    python tools/cmc_stub.py --port 8200
+    CMC_API_URL=http://127.0.0.1:8200 python dashboard.py
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+def fake_quote(price=0.15):
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    return {
+        'status': {'error_code': 0, 'timestamp': now},
+        'data': {
+            '1721': {
+                'id': 1721,
+                'name': 'Mysterium',
+                'symbol': 'MYST',
+                'slug': 'mysterium',
+                'max_supply': None,
+                'circulating_supply': 20000000,
+                'total_supply': 32000000,
+                'quote': {
+                    'USD': {
+                        'price': price,
+                        'volume_24h': 150000.0,
+                        'volume_change_24h': -2.5,
+                        'percent_change_1h': 0.1,
+                        'percent_change_24h': -1.2,
+                        'percent_change_7d': 3.4,
+                        'percent_change_30d': -5.6,
+                        'market_cap': price * 20000000,
+                        'fully_diluted_market_cap': price * 32000000,
+                        'last_updated': now
+                    }
+                }
+            }
+        }
+    }
+
+class CMCStubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    price = 0.15
+    requests_served = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/stats':
+            return self.send_json({'requests_served': type(self).requests_served})
+        with self.lock:
+            type(self).requests_served += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if url.path != '/v2/cryptocurrency/quotes/latest':
+            return self.send_json({'status': {'error_code': 404, 'error_message': 'not found'}}, 404)
+        if not self.headers.get('X-CMC_PRO_API_KEY'):
+            return self.send_json({'status': {'error_code': 1002, 'error_message': 'API key missing.'}}, 401)
+        self.send_json(fake_quote(self.price))
+
+def start_cmc_stub(host='127.0.0.1', port=0, latency=0.0, price=0.15):
+    """Start the stub in a background thread and return the server; its URL is http://host:server.server_port"""
+    handler = type('CMCStub', (CMCStubHandler,), {
+        'latency': latency,
+        'price': price,
+        'requests_served': 0,
+        'lock': threading.Lock()
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.handler = handler
+    threading.Thread(target=server.serve_forever, name='cmc-stub', daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local CoinMarketCap quotes API stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8200)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to sleep before each response')
+    parser.add_argument('--price', type=float, default=0.15, help='MYST price in USD')
+    args = parser.parse_args()
+
+    CMCStubHandler.latency = args.latency
+    CMCStubHandler.price = args.price
+    server = ThreadingHTTPServer((args.host, args.port), CMCStubHandler)
+    print(f"CoinMarketCap stub listening on http://{args.host}:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,97 @@
+"""Local stand-in for the Mysterium discovery API.
+
+Serves /api/v4/proposals with deterministic quality and location data for any
+requested provider_id, so the dashboard can be run and tested without network
+access:
+
+    python tools/discovery_stub.py --port 8100
+    DISCOVERY_API_URL=http://127.0.0.1:8100/api/v4 python dashboard.py
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+COUNTRIES = ['US', 'DE', 'FR', 'NL', 'GB', 'CA', 'SG', 'JP']
+
+def fake_proposal(provider_id, service_type='wireguard'):
+    """A proposal whose metrics are derived from the provider id, so repeated calls agree"""
+    seed = int(hashlib.sha256(provider_id.encode()).hexdigest(), 16)
+    return {
+        'provider_id': provider_id,
+        'service_type': service_type,
+        'quality': {
+            'quality': round(1 + (seed % 200) / 100, 2),
+            'latency': round(10 + seed % 190, 1),
+            'bandwidth': round(20 + (seed >> 8) % 480, 1),
+            'uptime': (seed >> 16) % 720,
+            'packetLoss': round(((seed >> 24) % 50) / 10, 1)
+        },
+        'location': {
+            'country': COUNTRIES[seed % len(COUNTRIES)],
+            'city': 'Stubville',
+            'isp': 'Stub ISP',
+            'continent': 'EU',
+            'ip_type': 'residential'
+        }
+    }
+
+class DiscoveryStubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    unknown_providers = set()
+    requests_served = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with DiscoveryStubHandler.lock:
+            DiscoveryStubHandler.requests_served += 1
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlsplit(self.path)
+        if url.path == '/stats':
+            return self.send_json({'requests_served': DiscoveryStubHandler.requests_served})
+        if url.path.rstrip('/') != '/api/v4/proposals':
+            return self.send_json({'error': 'not found'}, 404)
+        query = parse_qs(url.query)
+        provider_ids = query.get('provider_id', [])
+        self.send_json([
+            fake_proposal(provider_id, query.get('service_type', ['wireguard'])[0])
+            for provider_id in provider_ids
+            if provider_id not in self.unknown_providers
+        ])
+
+def start_discovery_stub(host='127.0.0.1', port=0, latency=0.0, unknown_providers=()):
+    """Start the stub in a background thread and return the server; its URL is http://host:server.server_port/api/v4"""
+    handler = type('DiscoveryStub', (DiscoveryStubHandler,), {
+        'latency': latency,
+        'unknown_providers': set(unknown_providers)
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name='discovery-stub', daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Mysterium discovery API stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to sleep before each response')
+    args = parser.parse_args()
+
+    DiscoveryStubHandler.latency = args.latency
+    server = ThreadingHTTPServer((args.host, args.port), DiscoveryStubHandler)
+    print(f"Discovery stub listening on http://{args.host}:{args.port}/api/v4")
+    server.serve_forever()
@@ -0,0 +1,246 @@
+"""Simulated Tequila API for load testing the dashboard without real nodes.
+
+Each fake node is its own HTTP server answering the Tequila endpoints the
+dashboard calls (/healthcheck, /sessions, /sessions/stats-*, /services,
+/identities, /nat/type, ...), with configurable latency, error rate and
+session volume. Calls are counted per path so the upstream load caused by
+the dashboard can be measured:
+
+    python tools/fake_tequila.py --nodes 20 --base-port 19000 --latency 0.05
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+COUNTRIES = ['US', 'DE', 'FR', 'NL', 'GB', 'CA', 'SG', 'JP']
+SERVICE_TYPES = ['wireguard', 'scraping', 'data_transfer', 'dvpn']
+
+def fake_sessions(count, seed, days=30):
+    """`count` sessions spread over the last `days` days, newest first; the three newest are still open"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    step = timedelta(days=days) / max(count, 1)
+    sessions = []
+    for i in range(count):
+        duration = rng.randint(60, 7200)
+        sessions.append({
+            'id': f"{seed:04d}-{i:06d}",
+            'direction': 'Provided',
+            'consumer_id': f"0xconsumer{rng.randint(0, 999):03d}",
+            'hermes_id': '0xhermes',
+            'provider_id': f"0xprovider{seed:04d}",
+            'service_type': rng.choice(SERVICE_TYPES),
+            'consumer_country': rng.choice(COUNTRIES),
+            'created_at': (now - step * i).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'duration': duration,
+            'bytes_received': rng.randint(10**5, 10**9),
+            'bytes_sent': rng.randint(10**5, 10**9),
+            'tokens': rng.randint(10**14, 10**17),
+            'status': 'New' if i < 3 else 'Completed'
+        })
+    return sessions
+
+class FakeTequilaHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    sessions = []
+    provider_id = '0xprovider'
+    token_ttl = 0
+    calls = None
+    lock = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def begin(self):
+        """Count the call and simulate network latency; returns False if this call should fail"""
+        url = urlsplit(self.path)
+        with self.lock:
+            self.calls[url.path] += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        return random.random() >= self.error_rate
+
+    def issue_token(self):
+        """A JWT-shaped token expiring after token_ttl seconds (signature not checked)"""
+        def encode(part):
+            return base64.urlsafe_b64encode(json.dumps(part).encode()).decode().rstrip('=')
+        return '.'.join([encode({'alg': 'none'}), encode({'exp': int(time.time() + self.token_ttl)}), 'fake'])
+
+    def authorized(self):
+        """With token_ttl set, only unexpired tokens from issue_token are accepted"""
+        if not self.token_ttl:
+            return True
+        try:
+            payload = self.headers.get('Authorization', '').split(' ')[-1].split('.')[1]
+            return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))['exp'] > time.time()
+        except Exception:
+            return False
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        if not self.begin():
+            return self.send_json({'message': 'simulated failure'}, 500)
+        url = urlsplit(self.path)
+        path = url.path[len('/tequilapi'):] if url.path.startswith('/tequilapi') else url.path
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path != '/stats' and not self.authorized():
+            return self.send_json({'message': 'unauthorized'}, 401)
+        if path == '/healthcheck':
+            return self.send_json({'uptime': '72h0m0s', 'process': 1, 'version': '1.30.0',
+                                   'build_info': {'commit': 'fake', 'branch': 'main', 'build_number': '1'}})
+        if path == '/sessions/stats-aggregated':
+            return self.send_json({'stats': self.aggregate(self.sessions)})
+        if path == '/sessions/stats-daily':
+            return self.send_json({'items': self.daily(), 'stats': self.aggregate(self.sessions)})
+        if path == '/sessions':
+            return self.send_json(self.session_page(query))
+        if path.startswith('/sessions/'):
+            session_id = path.split('/')[-1]
+            session = next((item for item in self.sessions if item['id'] == session_id), None)
+            return self.send_json(session) if session else self.send_json({'message': 'not found'}, 404)
+        if path == '/services':
+            return self.send_json([{'id': 'fake-wireguard', 'provider_id': self.provider_id,
+                                    'type': 'wireguard', 'status': 'Running', 'options': {}}])
+        if path == '/identities':
+            return self.send_json({'identities': [{'id': self.provider_id}]})
+        if path == '/nat/type':
+            return self.send_json({'type': 'fullcone', 'error': ''})
+        if path == '/node/monitoring-status':
+            return self.send_json({'status': 'success'})
+        if path == '/proposals':
+            return self.send_json([{'provider_id': self.provider_id, 'nat_compatibility': 'fullcone'}])
+        if path == '/connection/statistics':
+            return self.send_json({'bytesReceived': 0, 'bytesSent': 0, 'duration': 0, 'tokensSpent': 0})
+        if url.path == '/stats':
+            return self.send_json(dict(self.calls))
+        self.send_json({'message': 'not found'}, 404)
+
+    def do_POST(self):
+        if not self.begin():
+            return self.send_json({'message': 'simulated failure'}, 500)
+        path = urlsplit(self.path).path[len('/tequilapi'):]
+        body = self.read_json()
+        if path == '/auth/authenticate':
+            return self.send_json({'token': self.issue_token() if self.token_ttl else 'fake-token'})
+        if not self.authorized():
+            return self.send_json({'message': 'unauthorized'}, 401)
+        if path == '/services':
+            return self.send_json({'id': f"fake-{body.get('type')}", 'provider_id': body.get('provider_id'),
+                                   'type': body.get('type'), 'status': 'Running', 'options': {}}, 201)
+        self.send_json({'message': 'not found'}, 404)
+
+    def do_DELETE(self):
+        if not self.begin():
+            return self.send_json({'message': 'simulated failure'}, 500)
+        if not self.authorized():
+            return self.send_json({'message': 'unauthorized'}, 401)
+        self.send_response(202)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def session_page(self, query):
+        items = self.sessions
+        if query.get('status'):
+            items = [item for item in items if item['status'] == query['status']]
+        if query.get('date_from'):
+            items = [item for item in items if item['created_at'][:10] >= query['date_from']]
+        if query.get('date_to'):
+            items = [item for item in items if item['created_at'][:10] <= query['date_to']]
+        page_size = int(query.get('page_size') or 50)
+        page = int(query.get('page') or 1)
+        total_pages = max((len(items) + page_size - 1) // page_size, 1)
+        return {
+            'items': items[(page - 1) * page_size:page * page_size],
+            'paging': {'total_items': len(items), 'current_page': page, 'total_pages': total_pages}
+        }
+
+    @staticmethod
+    def aggregate(sessions):
+        return {
+            'count': len(sessions),
+            'count_consumers': len(set(item['consumer_id'] for item in sessions)),
+            'sum_bytes_received': sum(item['bytes_received'] for item in sessions),
+            'sum_bytes_sent': sum(item['bytes_sent'] for item in sessions),
+            'sum_duration': sum(item['duration'] for item in sessions),
+            'sum_tokens': sum(item['tokens'] for item in sessions)
+        }
+
+    def daily(self):
+        by_day = {}
+        for item in self.sessions:
+            by_day.setdefault(item['created_at'][:10], []).append(item)
+        return {day: self.aggregate(items) for day, items in by_day.items()}
+
+def start_fake_node(host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, sessions=200, seed=0,
+                    token_ttl=0):
+    """Start one fake node in a background thread and return the server.
+
+    server.calls is a Counter of requests received per path. With token_ttl the
+    node issues expiring JWTs and answers 401 to expired or missing ones.
+    """
+    calls = Counter()
+    handler = type('FakeTequila', (FakeTequilaHandler,), {
+        'latency': latency,
+        'jitter': jitter,
+        'error_rate': error_rate,
+        'sessions': fake_sessions(sessions, seed),
+        'provider_id': f"0xprovider{seed:04d}",
+        'token_ttl': token_ttl,
+        'calls': calls,
+        'lock': threading.Lock()
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.calls = calls
+    threading.Thread(target=server.serve_forever, name=f'fake-tequila-{seed}', daemon=True).start()
+    return server
+
+def start_fake_fleet(count, host='127.0.0.1', base_port=0, **options):
+    """Start `count` fake nodes on consecutive ports from base_port (or random ports when 0)"""
+    return [
+        start_fake_node(host, base_port + i if base_port else 0, seed=i + 1, **options)
+        for i in range(count)
+    ]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulated Tequila API fleet')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--nodes', type=int, default=1)
+    parser.add_argument('--base-port', type=int, default=19000)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds to sleep before each response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency of up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls answered with HTTP 500')
+    parser.add_argument('--sessions', type=int, default=200, help='sessions per node')
+    parser.add_argument('--token-ttl', type=int, default=0, help='issue JWTs expiring after this many seconds')
+    args = parser.parse_args()
+
+    servers = start_fake_fleet(args.nodes, args.host, args.base_port, latency=args.latency, jitter=args.jitter,
+                               error_rate=args.error_rate, sessions=args.sessions, token_ttl=args.token_ttl)
+    for server in servers:
+        print(f"Fake node listening on http://{args.host}:{server.server_port}/tequilapi")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass